@@ -98,6 +98,67 @@ DATABASES = {
     }
 }
 
+# REST framework
+# Router viewsets page with cursors: id order by default, (timestamp, id) for
+# the time-series viewsets (see main/pagination.py).
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'main.pagination.IdCursorPagination',
+    'PAGE_SIZE': 100,
+}
+
+# Cache
+# Point this at Redis or Memcached to share topology snapshots and metrics
+# between worker processes. The topology version itself is read from the
+# database, at most every TOPOLOGY_VERSION_TTL seconds per process, so workers
+# stay in step with either backend.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+TOPOLOGY_VERSION_TTL = 2.0
+
+# DaqLog ingestion
+# With write-behind enabled, /daqlogs/ and /daqlogs/batch/ answer 202 once the
+# rows are spilled to disk, and a background thread inserts them in batches.
+# /daqlogs/batch/ bodies may be up to DAQLOG_BATCH_MAX_BYTES (about 500k NDJSON
+# rows at 32 MB) instead of DATA_UPLOAD_MAX_MEMORY_SIZE; larger ones get a 413.
+
+DAQLOG_WRITE_BEHIND = False
+DAQLOG_BUFFER_SPILL_DIR = BASE_DIR / 'spill'
+DAQLOG_BATCH_MAX_BYTES = 32 * 1024 * 1024
+
+# DaqLog archival
+# archive_daqlogs moves whole months older than the retention window to Parquet
+# files; /daqlogs/ reads them back for ranges that start before the window.
+
+DAQLOG_RETENTION_DAYS = 365
+DAQLOG_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Live push (/api/events/)
+# The in-process broker only reaches clients connected to the same process;
+# with several workers use 'main.push.RedisBroker' and set PUSH_REDIS_URL
+# (needs redis, see requirements-optional.txt).
+
+PUSH_BROKER = 'main.push.InProcessBroker'
+
+# Production metric series (/api/production-metrics/series/)
+# Shift and day buckets follow the line's ShiftCalendar. Lines without one use
+# METRICS_SHIFT_HOURS long shifts, the first starting at METRICS_SHIFT_START_HOUR
+# local time.
+
+METRICS_SHIFT_HOURS = 8
+METRICS_SHIFT_START_HOUR = 6
+METRICS_SERIES_MAX_BUCKETS = 2000
+
+# Shift boundaries kept in memory per calendar, in days around today; day= and
+# shift= selectors outside that span are expanded on demand.
+
+SHIFT_INDEX_PAST_DAYS = 400
+SHIFT_INDEX_FUTURE_DAYS = 7
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
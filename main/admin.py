@@ -2,7 +2,8 @@ from django.contrib import admin
 from .models import (
     AuthRole, AuthUser, Plant, Block, Line, Machine, 
     SensorTagType, SensorTag, DaqLog, Alert, Incident, 
-    IncidentTransaction
+    IncidentTransaction, DaqLogRollup, DaqLogRollupState, DaqLogImportCheckpoint,
+    SensorTagLatest, ShiftCalendar, Shift
 )
 
 admin.site.register(AuthRole)
@@ -16,4 +17,10 @@ admin.site.register(SensorTag)
 admin.site.register(DaqLog)
 admin.site.register(Alert)
 admin.site.register(Incident)
-admin.site.register(IncidentTransaction)
\ No newline at end of file
+admin.site.register(IncidentTransaction)
+admin.site.register(DaqLogRollup)
+admin.site.register(DaqLogRollupState)
+admin.site.register(DaqLogImportCheckpoint)
+admin.site.register(SensorTagLatest)
+admin.site.register(ShiftCalendar)
+admin.site.register(Shift)
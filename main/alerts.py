@@ -0,0 +1,152 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import topology
+from .models import Alert, SensorTag
+
+# Threshold alerts for ingested readings. A tag goes "high" when a reading
+# exceeds max_val and only clears once it drops below max_val minus the
+# hysteresis band (a fraction of the tag's min..max span); "low" mirrors that
+# around min_val. An Alert is written when a tag enters either state, at most
+# once per ALERT_COOLDOWN_SECONDS, so a signal flapping across a limit
+# produces one row instead of one per reading. State is per process.
+
+HIGH, LOW = 0, 1
+KIND_NAMES = ('High', 'Low')
+
+_lock = threading.Lock()
+_state = {'ids': None}
+
+
+def hysteresis():
+    return getattr(settings, 'ALERT_HYSTERESIS', 0.02)
+
+
+def cooldown_ns():
+    return int(getattr(settings, 'ALERT_COOLDOWN_SECONDS', 300) * 1e9)
+
+
+def _load_thresholds():
+    # Tags with an empty threshold_alert (the Alert type) are not evaluated.
+    rows = list(
+        SensorTag.objects.filter(inactive=False).exclude(threshold_alert='').order_by('id')
+        .values_list('id', 'machine__line_id', 'name', 'threshold_alert', 'min_val', 'max_val')
+    )
+    min_val = np.array([row[4] for row in rows], dtype=np.float64)
+    max_val = np.array([row[5] for row in rows], dtype=np.float64)
+    band = hysteresis() * (max_val - min_val)
+    return {
+        'ids': np.array([row[0] for row in rows], dtype=np.int64),
+        'line_ids': [row[1] for row in rows],
+        'names': [row[2] for row in rows],
+        'types': [row[3] for row in rows],
+        # Per kind: the limit that raises and the level that clears.
+        'raise': (max_val, min_val),
+        'clear': (max_val - band, min_val + band),
+    }
+
+
+def thresholds():
+    return topology.versioned('alert_thresholds', _load_thresholds)
+
+
+def _current_state(limits):
+    # Called with _lock held. Carries active/cooldown state over when the
+    # thresholds are reloaded after a topology change.
+    ids = limits['ids']
+    if _state['ids'] is ids:
+        return _state
+
+    active = np.zeros((2, len(ids)), dtype=bool)
+    last_raised = np.full((2, len(ids)), np.iinfo(np.int64).min // 2, dtype=np.int64)
+    if _state['ids'] is not None:
+        _, old, new = np.intersect1d(_state['ids'], ids, assume_unique=True, return_indices=True)
+        active[:, new] = _state['active'][:, old]
+        last_raised[:, new] = _state['last_raised'][:, old]
+    _state.update(ids=ids, active=active, last_raised=last_raised)
+    return _state
+
+
+def evaluate_readings(tag_ids, timestamps, values):
+    """Run a batch of readings through the thresholds; returns the Alerts created.
+
+    timestamps must be timezone-aware (a DatetimeIndex or anything it accepts).
+    """
+    limits = thresholds()
+    ids = limits['ids']
+    if not len(ids) or not len(tag_ids):
+        return []
+
+    tags = np.asarray(tag_ids, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(ids, tags), len(ids) - 1)
+    known = ids[positions] == tags
+    if not known.any():
+        return []
+
+    # Group readings by tag, in time order within each tag.
+    positions = positions[known]
+    stamps = pd.DatetimeIndex(timestamps).as_unit('ns').asi8[known]
+    readings = np.asarray(values, dtype=np.float64)[known]
+    order = np.lexsort((stamps, positions))
+    positions, stamps, readings = positions[order], stamps[order], readings[order]
+
+    index = np.arange(len(positions))
+    first = np.r_[True, positions[1:] != positions[:-1]]
+    starts = np.flatnonzero(first)
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(positions)]))
+    last = np.r_[starts[1:], len(positions)] - 1
+
+    raised = []
+    with _lock:
+        state = _current_state(limits)
+        for kind in (HIGH, LOW):
+            if kind == HIGH:
+                enter = readings > limits['raise'][kind][positions]
+                leave = readings <= limits['clear'][kind][positions]
+            else:
+                enter = readings < limits['raise'][kind][positions]
+                leave = readings >= limits['clear'][kind][positions]
+
+            # Readings between the two levels keep the previous state: take the
+            # latest deciding reading of the same tag, else the stored state.
+            active = state['active'][kind]
+            decided = np.maximum.accumulate(np.where(enter | leave, index, -1))
+            now = np.where(decided >= group_start, enter[np.maximum(decided, 0)], active[positions])
+            before = np.where(first, active[positions], np.r_[False, now[:-1]])
+            active[positions[last]] = now[last]
+
+            last_raised = state['last_raised'][kind]
+            cooldown = cooldown_ns()
+            for i in np.flatnonzero(now & ~before).tolist():
+                position = positions[i]
+                if stamps[i] - last_raised[position] >= cooldown:
+                    last_raised[position] = stamps[i]
+                    raised.append((position, stamps[i], kind))
+
+    if not raised:
+        return []
+
+    tz = timezone.get_current_timezone()
+    alerts = [
+        Alert(
+            line_id=limits['line_ids'][position],
+            tag_id=int(ids[position]),
+            timestamp=pd.Timestamp(stamp, tz='UTC').tz_convert(tz).time(),
+            name=f"{KIND_NAMES[kind]} {limits['names'][position]}"[:100],
+            type=limits['types'][position],
+        )
+        for position, stamp, kind in raised
+    ]
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Alert.objects.bulk_create(alerts)
+    # MySQL's bulk insert does not return pks, and pushed events carry them.
+    # Alerts are rare enough (one per tag and cooldown) to save one by one.
+    with transaction.atomic():
+        for alert in alerts:
+            alert.save(force_insert=True)
+    return alerts
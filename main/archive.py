@@ -0,0 +1,135 @@
+import os
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import DaqLog
+from .streaming import chunk_size, keyset_chunks
+
+# One zstd Parquet file per tag and UTC month: <archive dir>/tag=<id>/<YYYY-MM>.parquet.
+# The tag is implied by the path, so it is not stored as a column.
+ARCHIVE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('value', pa.float64()),
+    ('inactive', pa.bool_()),
+    ('modified', pa.timestamp('us', tz='UTC')),
+])
+ARCHIVE_COLUMNS = tuple(ARCHIVE_SCHEMA.names)
+
+
+def archive_dir():
+    return Path(getattr(settings, 'DAQLOG_ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
+
+
+def retention_cutoff():
+    """Start of the oldest UTC month still kept in ap_DaqLog."""
+    days = getattr(settings, 'DAQLOG_RETENTION_DAYS', 365)
+    moment = timezone.now().astimezone(dt_timezone.utc) - timedelta(days=days)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_path(tag_id, month):
+    return archive_dir() / f'tag={tag_id}' / f'{month:%Y-%m}.parquet'
+
+
+def _next_month(month):
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def _months(start, stop):
+    month = start.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month < stop:
+        yield month
+        month = _next_month(month)
+
+
+def _write(path, table):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        # Rows that reached the table after the month was archived, or a rerun
+        # after a crash between writing and deleting: merge and keep one copy.
+        merged = pa.concat_tables([pq.read_table(path), table]).to_pandas()
+        merged = merged.drop_duplicates('id', keep='last').sort_values(['timestamp', 'id'])
+        table = pa.Table.from_pandas(merged, schema=ARCHIVE_SCHEMA, preserve_index=False)
+    temporary = path.with_suffix('.tmp')
+    pq.write_table(table, temporary, compression='zstd')
+    os.replace(temporary, path)
+
+
+def archive_month(tag_id, month, batch_size):
+    """Move one tag's rows for one month to its archive file; returns the row count."""
+    queryset = DaqLog.objects.filter(tag_id=tag_id, timestamp__gte=month, timestamp__lt=_next_month(month))
+    rows = [row for chunk in keyset_chunks(queryset, ARCHIVE_COLUMNS) for row in chunk]
+    if not rows:
+        return 0
+
+    table = pa.Table.from_pydict(dict(zip(ARCHIVE_COLUMNS, zip(*rows))), schema=ARCHIVE_SCHEMA)
+    _write(month_path(tag_id, month), table)
+
+    # The file is in place, so the rows can go; bounded batches keep each
+    # DELETE's lock footprint and undo log small.
+    ids = table.column('id').to_pylist()
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            DaqLog.objects.filter(id__in=ids[start:start + batch_size]).delete()
+    return len(ids)
+
+
+def archive_daqlogs(batch_size, progress=None):
+    """Archive every complete month older than the retention window."""
+    cutoff = retention_cutoff()
+    oldest = (
+        DaqLog.objects.filter(timestamp__lt=cutoff)
+        .values('tag_id')
+        .annotate(first=Min('timestamp'))
+        .order_by('tag_id')
+    )
+    archived = 0
+    for row in oldest:
+        for month in _months(row['first'], cutoff):
+            count = archive_month(row['tag_id'], month, batch_size)
+            archived += count
+            if count and progress is not None:
+                progress(row['tag_id'], month, count)
+    return archived
+
+
+def _batch_rows(batch, tag_id, columns):
+    data = {name: batch.column(name).to_pylist() for name in columns if name != 'tag_id'}
+    data['tag_id'] = [int(tag_id)] * batch.num_rows
+    return list(zip(*(data[column] for column in columns)))
+
+
+def archive_chunks(tag_id, start, end, columns, size=None):
+    """Yield archived rows of one tag in [start, end] as lists of `columns` tuples.
+
+    Only months before the retention cutoff are looked up. Files are
+    memory-mapped and read one record batch at a time, so memory stays flat
+    however long the range is; rows come in (timestamp, id) order.
+    """
+    size = size or chunk_size()
+    low = pa.scalar(start, type=ARCHIVE_SCHEMA.field('timestamp').type)
+    high = pa.scalar(end, type=ARCHIVE_SCHEMA.field('timestamp').type)
+    names = [name for name in columns if name != 'tag_id']
+    for month in _months(start, min(end, retention_cutoff())):
+        path = month_path(tag_id, month)
+        if not path.exists():
+            continue
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=size, columns=names):
+            stamps = batch.column('timestamp')
+            batch = batch.filter(pc.and_(pc.greater_equal(stamps, low), pc.less_equal(stamps, high)))
+            if batch.num_rows:
+                yield _batch_rows(batch, tag_id, columns)
+
+
+def read_archive(tag_id, start, end, columns):
+    """archive_chunks() as one list, for callers that sort or downsample it."""
+    return [row for chunk in archive_chunks(tag_id, start, end, columns) for row in chunk]
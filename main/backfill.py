@@ -0,0 +1,158 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from .ingest import validate_readings, write_daqlogs
+from .models import DaqLogImportCheckpoint, SensorTag
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# Historian exports carry one reading per row in these columns.
+COLUMNS = ['tag_id', 'timestamp', 'value']
+
+
+def _csv_chunks(path, chunk_size, skip):
+    # skiprows keeps the header line and drops the rows already imported.
+    reader = pd.read_csv(path, usecols=COLUMNS, chunksize=chunk_size,
+                         skiprows=range(1, skip + 1) if skip else None)
+    with reader:
+        yield from reader
+
+
+def _parquet_chunks(path, chunk_size, skip):
+    parquet = pq.ParquetFile(path)
+    # Seek to the row group holding row `skip` instead of decoding everything before it.
+    offsets = np.cumsum([0] + [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)])
+    first = int(np.searchsorted(offsets, skip, side='right')) - 1
+    if first >= parquet.num_row_groups:
+        return
+    skip -= int(offsets[first])
+    row_groups = list(range(first, parquet.num_row_groups))
+    for batch in parquet.iter_batches(batch_size=chunk_size, row_groups=row_groups, columns=COLUMNS):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            continue
+        yield batch.slice(skip).to_pandas()
+        skip = 0
+
+
+def read_chunks(path, chunk_size, skip=0):
+    """Yield DataFrames of at most chunk_size rows, starting after `skip` rows."""
+    if Path(path).suffix.lower() in ('.parquet', '.pq'):
+        if pq is None:
+            raise RuntimeError("Reading Parquet requires pyarrow.")
+        return _parquet_chunks(path, chunk_size, skip)
+    return _csv_chunks(path, chunk_size, skip)
+
+
+def tag_ranges(workers):
+    """Split the SensorTag ids into `workers` contiguous (first, last) ranges.
+
+    The ranges cover every id, with the last one open (last is None), so tags
+    added after the split still belong to exactly one range.
+    """
+    ids = np.array(sorted(SensorTag.objects.values_list('id', flat=True)), dtype=np.int64)
+    starts = [int(part[0]) for part in np.array_split(ids, workers) if len(part)] or [0]
+    starts[0] = 0
+    return [(start, following - 1) for start, following in zip(starts, starts[1:])] + [(starts[-1], None)]
+
+
+def format_range(tag_range):
+    first, last = tag_range
+    return f"{first}-{'' if last is None else last}"
+
+
+def parse_ranges(text):
+    ranges = []
+    for part in filter(None, text.split(',')):
+        first, last = part.split('-')
+        ranges.append((int(first), int(last) if last else None))
+    return ranges
+
+
+def _source(path):
+    return str(Path(path).resolve())
+
+
+def plan_ranges(path, workers):
+    """The tag ranges to import `path` with; [None] means a single worker.
+
+    The split is stored with the file's checkpoint on the first run and reused
+    afterwards, since rows already committed by one split are not known to
+    another. Raises ValueError when resuming with a different worker count.
+    """
+    checkpoint, created = DaqLogImportCheckpoint.objects.get_or_create(source=_source(path))
+    if created or not checkpoint.positions:
+        ranges = tag_ranges(workers) if workers > 1 else []
+        checkpoint.tag_ranges = ','.join(format_range(tag_range) for tag_range in ranges)
+        checkpoint.save(update_fields=['tag_ranges', 'modified'])
+    else:
+        ranges = parse_ranges(checkpoint.tag_ranges)
+        if max(len(ranges), 1) != workers:
+            raise ValueError(
+                f"{path} was started with {max(len(ranges), 1)} worker(s); resume it with the same --workers."
+            )
+    return ranges or [None]
+
+
+def load(path, chunk_size, tag_range=None, progress=None):
+    """Import a CSV/Parquet file of readings, one transaction per chunk.
+
+    The checkpoint is updated in the same transaction as the chunk's inserts,
+    so a rerun after a crash resumes exactly after the last committed chunk.
+    With tag_range (one of plan_ranges()), only readings for those tag ids are
+    imported, tracked by their own position in the checkpoint.
+    """
+    checkpoint = DaqLogImportCheckpoint.objects.get_or_create(source=_source(path))[0]
+    key = format_range(tag_range) if tag_range else ''
+    if key not in ([''] if not checkpoint.tag_ranges else checkpoint.tag_ranges.split(',')):
+        raise ValueError(f"{path} is checkpointed for tag ranges '{checkpoint.tag_ranges}', not '{key}'.")
+
+    label = f"{checkpoint.source} [{key}]" if key else checkpoint.source
+    position = checkpoint.positions.get(key, 0)
+    started = time.monotonic()
+    imported = rejected = 0
+
+    for chunk in read_chunks(path, chunk_size, position):
+        consumed = len(chunk.index)
+        if tag_range:
+            first, last = tag_range
+            chunk = chunk[(chunk['tag_id'] >= first) & ((chunk['tag_id'] <= last) if last is not None else True)]
+        (tag_ids, timestamps, values), errors = validate_readings(
+            chunk['tag_id'].tolist(), chunk['timestamp'].tolist(), chunk['value'].tolist()
+        )
+        with transaction.atomic():
+            inserted = write_daqlogs(tag_ids, timestamps, values, live=False)
+            # Workers share the row; the lock is only held until this commit.
+            checkpoint = DaqLogImportCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+            position += consumed
+            checkpoint.positions[key] = position
+            checkpoint.imported += inserted
+            checkpoint.save(update_fields=['positions', 'imported', 'modified'])
+
+        imported += inserted
+        rejected += len(errors)
+        if progress is not None:
+            progress(label, imported, rejected, time.monotonic() - started)
+
+    return imported, rejected
+
+
+class QueueProgress:
+    """A picklable progress callback for worker processes.
+
+    Workers put their updates on a multiprocessing queue and the command
+    writes them to its own stdout.
+    """
+
+    def __init__(self, updates):
+        self.updates = updates
+
+    def __call__(self, label, imported, rejected, elapsed):
+        self.updates.put((label, imported, rejected, elapsed))
@@ -0,0 +1,221 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections
+
+from .ingest import after_write, insert_daqlogs
+
+logger = logging.getLogger(__name__)
+
+# Optional write-behind path for DaqLog ingest (DAQLOG_WRITE_BEHIND). Accepted
+# readings are appended to a per-process spill segment before the request
+# returns, then a flusher thread inserts them in batches and deletes the
+# segment as soon as the insert commits; the after_write() hooks run after
+# that and their failures are only logged. Inserts that fail because the
+# database is unavailable (restart, failover, lock wait) are retried with
+# exponential backoff for as long as it takes, while max_rows answers new
+# submits with BufferFull (429). Only a segment the database rejects as data
+# (IntegrityError, DataError) is renamed to *.dead and left for an operator,
+# so it cannot block the segments behind it. Segments left behind by a
+# crashed process are replayed on start.
+
+
+class BufferFull(Exception):
+    pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehindBuffer:
+    def __init__(self, spill_dir, max_rows=100000, flush_rows=5000, flush_interval=1.0, fsync=False, max_backoff=60.0):
+        self.spill_dir = Path(spill_dir)
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_backoff = max_backoff
+
+        self.condition = threading.Condition()
+        self.rows = []
+        # Segments handed to the flusher but not yet committed to the database.
+        self.pending = []
+        self.failures = 0
+        self.pending_rows = 0
+        self.token = time.time_ns()
+        self.segment = 0
+        self.spill = None
+        self.thread = None
+        self.stopping = False
+
+    def start(self):
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self._recover()
+        self._open_segment()
+        self.thread = threading.Thread(target=self._run, name='daqlog-write-behind', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, tag_ids, timestamps, values):
+        stamps = pd.DatetimeIndex(timestamps).tz_convert('UTC').astype(str).tolist()
+        rows = list(zip(tag_ids, stamps, values))
+
+        with self.condition:
+            if len(self.rows) + self.pending_rows + len(rows) > self.max_rows:
+                raise BufferFull()
+            self.spill.write(''.join(json.dumps(row) + '\n' for row in rows))
+            self.spill.flush()
+            if self.fsync:
+                os.fsync(self.spill.fileno())
+            self.rows.extend(rows)
+            if len(self.rows) >= self.flush_rows:
+                self.condition.notify()
+        return len(rows)
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=30)
+
+    def _segment_path(self, suffix):
+        self.segment += 1
+        return self.spill_dir / f'daqlog-{os.getpid()}-{self.token}-{self.segment}.{suffix}'
+
+    def _open_segment(self):
+        self.spill_path = self._segment_path('ndjson')
+        self.spill = open(self.spill_path, 'a', encoding='utf-8')
+
+    def _recover(self):
+        for path in sorted(self.spill_dir.glob('daqlog-*')):
+            if path.suffix == '.dead':
+                continue
+            # Our own pid here means a previous incarnation (e.g. pid 1 in a
+            # restarted container); nothing has been opened by this one yet.
+            pid = int(path.name.split('-')[1])
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            claimed = self._segment_path('flushing')
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # another worker claimed it first
+            with open(claimed, encoding='utf-8') as spill:
+                rows = [tuple(json.loads(line)) for line in spill if line.strip()]
+            self.pending.append((claimed, rows))
+            self.pending_rows += len(rows)
+            logger.info("Recovered %s buffered DaqLog rows from %s", len(rows), path.name)
+
+    def _rotate(self):
+        # Called with the condition held: hand the current rows and their
+        # spill segment to the flusher and start a fresh segment.
+        if not self.rows:
+            return
+        self.spill.close()
+        flushing = self.spill_path.with_suffix('.flushing')
+        os.rename(self.spill_path, flushing)
+        self.pending.append((flushing, self.rows))
+        self.pending_rows += len(self.rows)
+        self.rows = []
+        self._open_segment()
+
+    def _flush_pending(self):
+        while self.pending:
+            path, rows = self.pending[0]
+            tag_ids, timestamps, values = zip(*rows)
+            try:
+                index = insert_daqlogs(tag_ids, timestamps, values)
+            except (IntegrityError, DataError):
+                # Retrying cannot make the database accept these rows.
+                logger.exception("Moving %s rejected DaqLog rows to %s", len(rows), path.with_suffix('.dead').name)
+                os.rename(path, path.with_suffix('.dead'))
+                index = None
+            except Exception:
+                self.failures += 1
+                raise
+            else:
+                path.unlink()
+            with self.condition:
+                self.pending.pop(0)
+                self.pending_rows -= len(rows)
+                self.failures = 0
+
+            if index is not None:
+                try:
+                    after_write(tag_ids, index, values)
+                except Exception:
+                    logger.exception("DaqLog write-behind hooks failed for %s stored rows", len(rows))
+
+    def flush(self):
+        """Hand the buffered rows to the flusher and insert everything pending."""
+        with self.condition:
+            self._rotate()
+        self._flush_pending()
+
+    def retry_delay(self):
+        """Seconds to wait before retrying after self.failures failed inserts in a row."""
+        return min(self.flush_interval * 2 ** max(self.failures - 1, 0), self.max_backoff)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.stopping and len(self.rows) < self.flush_rows:
+                    self.condition.wait(self.flush_interval)
+                self._rotate()
+                stopping = self.stopping
+
+            try:
+                self._flush_pending()
+            except Exception:
+                delay = self.retry_delay()
+                logger.exception("DaqLog write-behind flush failed; rows stay spilled, retrying in %.0fs", delay)
+                if stopping:
+                    return
+                # Submits notify the condition too; only stop() cuts the wait short.
+                deadline = time.monotonic() + delay
+                with self.condition:
+                    while not self.stopping and time.monotonic() < deadline:
+                        self.condition.wait(deadline - time.monotonic())
+            finally:
+                close_old_connections()
+
+            if stopping:
+                return
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process-wide buffer, or None when write-behind is disabled."""
+    global _buffer
+    if not getattr(settings, 'DAQLOG_WRITE_BEHIND', False):
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer(
+                settings.DAQLOG_BUFFER_SPILL_DIR,
+                max_rows=getattr(settings, 'DAQLOG_BUFFER_MAX_ROWS', 100000),
+                flush_rows=getattr(settings, 'DAQLOG_BUFFER_FLUSH_ROWS', 5000),
+                flush_interval=getattr(settings, 'DAQLOG_BUFFER_FLUSH_INTERVAL', 1.0),
+                fsync=getattr(settings, 'DAQLOG_BUFFER_FSYNC', False),
+                max_backoff=getattr(settings, 'DAQLOG_BUFFER_MAX_BACKOFF', 60.0),
+            )
+            _buffer.start()
+    return _buffer
@@ -0,0 +1,11 @@
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size=1000):
+    # MySQL's ON DUPLICATE KEY UPDATE cannot name a conflict target, while
+    # SQLite and PostgreSQL require one.
+    connection = connections[router.db_for_write(model)]
+    options = {'update_conflicts': True, 'update_fields': update_fields, 'batch_size': batch_size}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return model.objects.bulk_create(objs, **options)
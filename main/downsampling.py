@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import numpy as np
+
+METHODS = ('lttb', 'minmax', 'avg')
+
+
+def _edges(n, buckets):
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets; returns the indices of the kept points."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Buckets cover the points between the fixed first and last samples.
+    edges = np.floor(np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # The point after the last bucket is the final sample itself.
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs((x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(x, y, threshold):
+    """Keeps the minimum and maximum of each bucket; returns sorted indices."""
+    n = len(x)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+
+    edges = _edges(n, buckets)
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(edges))
+    # Sorting by (bucket, value) puts each bucket's min first and max last.
+    order = np.lexsort((y, bucket_ids))
+    lows = order[edges[:-1]]
+    highs = order[edges[1:] - 1]
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def average(x, y, threshold):
+    """Mean of each bucket; returns new (x, y) arrays rather than indices."""
+    n = len(x)
+    if threshold >= n or threshold < 1:
+        return x, y
+
+    edges = _edges(n, threshold)
+    counts = np.diff(edges)
+    return (
+        np.add.reduceat(x, edges[:-1]) / counts,
+        np.add.reduceat(y, edges[:-1]) / counts,
+    )
+
+
+def downsample(rows, max_points, method='lttb'):
+    """Reduce time-ordered (timestamp, value) rows to about max_points rows."""
+    if len(rows) <= max_points:
+        return rows
+
+    timestamps = [row[0] for row in rows]
+    x = np.fromiter((ts.timestamp() for ts in timestamps), dtype=np.float64, count=len(rows))
+    y = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+
+    if method == 'avg':
+        tz = timestamps[0].tzinfo
+        avg_x, avg_y = average(x, y, max_points)
+        return [
+            (datetime.fromtimestamp(ts, tz=tz), value)
+            for ts, value in zip(avg_x.tolist(), avg_y.tolist())
+        ]
+
+    indices = minmax(x, y, max_points) if method == 'minmax' else lttb(x, y, max_points)
+    return [rows[i] for i in indices.tolist()]
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import topology
+from .alerts import evaluate_readings
+from .latest import record_latest
+from .models import DaqLog, SensorTag
+from .push import publish
+
+# Control panel payload key feeding each tag; other tags get simulated values.
+CONTROL_PANEL_FIELDS = {
+    'Watts Consumed': 'Vry',
+    'Voltage Phase R-Y': 'Vry',
+    'Voltage Phase Y-B': 'Vyb',
+    'Voltage Phase B-R': 'Vbr',
+    'Current Phase R': 'Cr',
+    'Current Phase Y': 'Cy',
+    'Current Phase B': 'Cb',
+    'Frequency': 'Freq',
+    'Temperature': 'Temp',
+}
+
+
+def batch_size():
+    return getattr(settings, 'DAQLOG_BULK_BATCH_SIZE', 2000)
+
+
+def _utc_index(timestamps):
+    index = pd.DatetimeIndex(timestamps)
+    if index.tz is None:
+        index = index.tz_localize(timezone.get_current_timezone())
+    return index.tz_convert('UTC')
+
+
+def _db_timestamps(index):
+    # Naive UTC text, the form Django itself stores for MySQL and SQLite.
+    return index.tz_localize(None).floor('us').astype(str).tolist()
+
+
+def after_write(tag_ids, timestamps, values, live=True):
+    """Hooks run on every batch of readings once it is stored.
+
+    Updates the latest-value store, then for live data checks the tag
+    thresholds (alerts.py) and pushes readings and alerts to subscribers
+    (push.py). Historic backfills pass live=False.
+    """
+    index = _utc_index(timestamps)
+    record_latest(tag_ids, index, values)
+    if live:
+        alerts = evaluate_readings(tag_ids, index, values)
+        publish(tag_ids, index, values, alerts)
+
+
+def insert_daqlogs(tag_ids, timestamps, values):
+    """Insert columnar readings with chunked multi-row INSERTs in one transaction.
+
+    Returns the UTC DatetimeIndex of the stored readings.
+    """
+
+    meta = DaqLog._meta
+    columns = ['timestamp', 'tag', 'value', 'inactive', 'modified']
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(meta.db_table),
+        ', '.join(connection.ops.quote_name(meta.get_field(name).column) for name in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    index = _utc_index(timestamps)
+    modified = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = [
+        (timestamp, tag_id, value, False, modified)
+        for timestamp, tag_id, value in zip(_db_timestamps(index), tag_ids, values)
+    ]
+
+    size = batch_size()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), size):
+            cursor.executemany(sql, rows[start:start + size])
+    return index
+
+
+def write_daqlogs(tag_ids, timestamps, values, live=True):
+    """insert_daqlogs(), then after_write()."""
+    if not len(tag_ids):
+        return 0
+    index = insert_daqlogs(tag_ids, timestamps, values)
+    after_write(tag_ids, index, values, live)
+    return len(index)
+
+
+def _load_control_panel_tags():
+    rows = list(
+        SensorTag.objects.filter(machine__line__status='active').values_list('id', 'name', 'min_val', 'max_val')
+    )
+    keys = sorted(set(CONTROL_PANEL_FIELDS.values()))
+    key_index = {key: i for i, key in enumerate(keys)}
+    return {
+        'ids': [row[0] for row in rows],
+        'min_val': np.array([row[2] for row in rows], dtype=np.float64),
+        'max_val': np.array([row[3] for row in rows], dtype=np.float64),
+        # Index into the payload vector, or -1 for simulated tags.
+        'field': np.array([key_index.get(CONTROL_PANEL_FIELDS.get(row[1]), -1) for row in rows], dtype=np.int64),
+        'keys': keys,
+    }
+
+
+def control_panel_tags():
+    return topology.versioned('control_panel_tags', _load_control_panel_tags)
+
+
+def control_panel_values(tags, data):
+    payload = np.array([float(data.get(key, 0)) for key in tags['keys']], dtype=np.float64)
+    mapped = tags['field'] >= 0
+    simulated = np.random.uniform(tags['min_val'], tags['max_val'])
+    values = np.where(mapped, payload[np.where(mapped, tags['field'], 0)], simulated)
+    return np.maximum(np.minimum(values, tags['max_val']), tags['min_val'])
+
+
+def _load_tag_ids():
+    return np.array(sorted(SensorTag.objects.values_list('id', flat=True)), dtype=np.int64)
+
+
+def known_tag_ids():
+    return topology.versioned('tag_ids', _load_tag_ids)
+
+
+def validate_readings(tag_ids, timestamps, values):
+    """Coerce columnar readings; returns the valid rows and per-row errors."""
+    tags = pd.to_numeric(pd.Series(tag_ids, dtype=object), errors='coerce')
+    stamps = pd.to_datetime(pd.Series(timestamps, dtype=object), errors='coerce', utc=True, format='ISO8601')
+    readings = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+
+    bad_tag = ~tags.isin(known_tag_ids())
+    bad_timestamp = stamps.isna()
+    bad_value = readings.isna() | np.isinf(readings)
+    invalid = (bad_tag | bad_timestamp | bad_value).to_numpy()
+
+    errors = []
+    for index in np.flatnonzero(invalid).tolist():
+        if bad_tag.iat[index]:
+            message = "Unknown tag."
+        elif bad_timestamp.iat[index]:
+            message = "Invalid timestamp."
+        else:
+            message = "Invalid value."
+        errors.append({"index": index, "error": message})
+
+    valid = ~invalid
+    return (
+        tags[valid].astype(np.int64).tolist(),
+        stamps[valid],
+        readings[valid].astype(np.float64).tolist(),
+    ), errors
@@ -0,0 +1,149 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import topology
+from .models import SensorTag, SensorTagLatest
+from .serializers import format_datetime
+
+# Current value of every tag. ap_SensorTagLatest is upserted on ingest, with
+# the update conditional on the stored timestamp so that no worker can move a
+# tag back to an older reading, and mirrored in a per-process dict
+# {tag_id: (timestamp, value)}. Writes from this
+# process update the mirror directly; rows written by other workers are
+# picked up by an incremental "modified since" read at most every
+# LATEST_VALUES_REFRESH_SECONDS.
+
+# Overlap for the incremental read, covering clock skew between workers.
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+_lock = threading.Lock()
+_mirror = {'values': {}, 'watermark': None, 'checked': 0.0}
+
+
+def refresh_seconds():
+    return getattr(settings, 'LATEST_VALUES_REFRESH_SECONDS', 1)
+
+
+def _refresh():
+    # Called with _lock held.
+    if time.monotonic() - _mirror['checked'] < refresh_seconds():
+        return
+    rows = SensorTagLatest.objects.all()
+    if _mirror['watermark'] is not None:
+        rows = rows.filter(modified__gte=_mirror['watermark'] - REFRESH_OVERLAP)
+    values = _mirror['values']
+    for tag_id, timestamp, value, modified in rows.values_list('tag_id', 'timestamp', 'value', 'modified'):
+        current = values.get(tag_id)
+        if current is None or current[0] <= timestamp:
+            values[tag_id] = (timestamp, value)
+        if _mirror['watermark'] is None or modified > _mirror['watermark']:
+            _mirror['watermark'] = modified
+    _mirror['checked'] = time.monotonic()
+
+
+def _upsert_newer(rows):
+    """Upsert (tag_id, timestamp, value) rows, keeping stored rows that are newer."""
+    meta = SensorTagLatest._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    tag, timestamp, value, modified = (quote(meta.get_field(name).column) for name in ('tag', 'timestamp', 'value', 'modified'))
+    if connection.vendor == 'mysql':
+        # Assignments apply left to right, so timestamp is compared before it
+        # is overwritten.
+        newer = f'VALUES({timestamp}) >= {timestamp}'
+        conflict = 'ON DUPLICATE KEY UPDATE ' + ', '.join(
+            f'{column} = IF({newer}, VALUES({column}), {column})' for column in (value, modified, timestamp)
+        )
+    else:
+        conflict = (
+            f'ON CONFLICT ({tag}) DO UPDATE SET {timestamp} = excluded.{timestamp}, {value} = excluded.{value}, '
+            f'{modified} = excluded.{modified} WHERE excluded.{timestamp} >= {table}.{timestamp}'
+        )
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    params = [
+        (tag_id, connection.ops.adapt_datetimefield_value(stamp), reading, now)
+        for tag_id, stamp, reading in rows
+    ]
+    sql = f'INSERT INTO {table} ({tag}, {timestamp}, {value}, {modified}) VALUES (%s, %s, %s, %s) {conflict}'
+    # No transaction: each row is a conditional upsert that is safe to apply
+    # on its own, and a savepoint would add two round trips per batch.
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def max_skew_ns():
+    return int(getattr(settings, 'LATEST_VALUES_MAX_SKEW_SECONDS', 300) * 1e9)
+
+
+def record_latest(tag_ids, index, values):
+    """Upsert the newest reading per tag of a batch; index is a UTC DatetimeIndex.
+
+    Readings stamped further ahead of now than LATEST_VALUES_MAX_SKEW_SECONDS
+    (e.g. synthetic data from insert_logs) are left out, so they cannot pin a
+    tag's value until real time catches up with them.
+    """
+    tags = np.asarray(tag_ids, dtype=np.int64)
+    stamps = index.as_unit('ns').asi8
+    current = stamps <= time.time_ns() + max_skew_ns()
+    if not current.all():
+        tags, stamps, values = tags[current], stamps[current], np.asarray(values, dtype=np.float64)[current]
+    if not len(tags):
+        return
+    order = np.lexsort((stamps, tags))
+    tags, stamps = tags[order], stamps[order]
+    last = np.r_[tags[1:] != tags[:-1], True]
+    tags, stamps = tags[last], stamps[last]
+    readings = np.asarray(values, dtype=np.float64)[order][last]
+
+    with _lock:
+        _refresh()
+        current = _mirror['values']
+        changed = []
+        for tag_id, stamp, value in zip(tags.tolist(), stamps.tolist(), readings.tolist()):
+            timestamp = pd.Timestamp(stamp, tz='UTC').to_pydatetime()
+            known = current.get(tag_id)
+            # Late or replayed readings never move a tag's value backwards.
+            if known is None or known[0] <= timestamp:
+                current[tag_id] = (timestamp, value)
+                changed.append((tag_id, timestamp, value))
+    if changed:
+        _upsert_newer(changed)
+
+
+def _load_scopes():
+    lines, machines = {}, {}
+    for tag_id, machine_id, line_id in SensorTag.objects.order_by('id').values_list('id', 'machine_id', 'machine__line_id'):
+        lines.setdefault(line_id, []).append(tag_id)
+        machines.setdefault(machine_id, []).append(tag_id)
+    return {'line': lines, 'machine': machines}
+
+
+def scope_tag_ids(line_id=None, machine_id=None):
+    scopes = topology.versioned('latest_scopes', _load_scopes)
+    if machine_id is not None:
+        return scopes['machine'].get(machine_id, [])
+    return scopes['line'].get(line_id, [])
+
+
+def latest_values(tag_ids):
+    """[{tag, timestamp, value}] for the given tags; null for tags never logged."""
+    with _lock:
+        _refresh()
+    values = _mirror['values']
+    tz = timezone.get_current_timezone()
+    result = []
+    for tag_id in tag_ids:
+        timestamp, value = values.get(tag_id, (None, None))
+        result.append({
+            'tag': tag_id,
+            'timestamp': format_datetime(timestamp, tz) if timestamp is not None else None,
+            'value': value,
+        })
+    return result
@@ -0,0 +1,39 @@
+import pandas as pd
+from django.utils import timezone
+
+from .models import SensorTag
+
+# Helpers for the workbook import commands. The legacy sheets reference
+# (line_id, legacy Tag id); each pair maps to the SensorTag of that name on
+# one of the line's machines.
+
+
+def read_sheet(excel, name):
+    if name not in excel.sheet_names:
+        return None
+    return excel.parse(name)
+
+
+def localize(column):
+    stamps = pd.to_datetime(column)
+    if stamps.dt.tz is None:
+        stamps = stamps.dt.tz_localize(timezone.get_current_timezone_name())
+    return stamps
+
+
+def sensor_tag_lookup():
+    # One query; the lowest id wins if a line has two tags with the same name.
+    rows = SensorTag.objects.order_by('id').values_list('machine__line_id', 'name', 'id')
+    lookup = pd.DataFrame.from_records(list(rows), columns=['line_id', 'name', 'sensor_tag_id'])
+    return lookup.drop_duplicates(['line_id', 'name'])
+
+
+def resolve_sensor_tags(frame, tag_sheet, lookup):
+    """SensorTag id for every (line_id, tag_id) row of frame, NaN if unknown."""
+    if tag_sheet is None:
+        # Without a legacy Tag sheet, tag_id already refers to SensorTag.
+        return frame['tag_id'].where(frame['tag_id'].isin(lookup['sensor_tag_id']))
+
+    names = tag_sheet.set_index('id')['name']
+    keys = pd.DataFrame({'line_id': frame['line_id'], 'name': frame['tag_id'].map(names)})
+    return keys.merge(lookup, on=['line_id', 'name'], how='left')['sensor_tag_id'].set_axis(frame.index)
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.archive import archive_daqlogs, archive_dir, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Moves DaqLog rows older than DAQLOG_RETENTION_DAYS into zstd Parquet files per tag and month'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per DELETE statement')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.stdout.write(f"Archiving logs before {retention_cutoff():%Y-%m-%d} to {archive_dir()}")
+        archived = archive_daqlogs(options['batch_size'], progress=self.progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} logs in {time.monotonic() - started:.1f}s"
+        ))
+
+    def progress(self, tag_id, month, count):
+        self.stdout.write(f"tag {tag_id} {month:%Y-%m}: {count} logs")
@@ -0,0 +1,73 @@
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from main.backfill import QueueProgress, load, plan_ranges
+
+
+class Command(BaseCommand):
+    help = 'Streams a CSV or Parquet export (tag_id, timestamp, value) into DaqLog, resuming from the last checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+')
+        parser.add_argument('--chunk-size', type=int, default=50000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Split the import over this many processes by SensorTag id range')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        chunk_size = options['chunk_size']
+        imported = rejected = 0
+
+        try:
+            # Validate every file's split before any worker starts.
+            plans = [(path, plan_ranges(path, options['workers'])) for path in options['files']]
+            if options['workers'] > 1:
+                # Forked workers must not share the parent's database connection.
+                connections.close_all()
+                with Manager() as manager, ProcessPoolExecutor(
+                    max_workers=options['workers'], initializer=django.setup
+                ) as pool:
+                    updates = manager.Queue()
+                    futures = [
+                        pool.submit(load, path, chunk_size, tag_range, QueueProgress(updates))
+                        for path, ranges in plans for tag_range in ranges
+                    ]
+                    self.relay_progress(updates, futures)
+                    for future in futures:
+                        done, failed = future.result()
+                        imported += done
+                        rejected += failed
+            else:
+                for path, _ in plans:
+                    done, failed = load(path, chunk_size, progress=self.progress)
+                    imported += done
+                    rejected += failed
+        except (OSError, RuntimeError, ValueError) as exc:
+            raise CommandError(exc)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} logs ({rejected} rejected) in {elapsed:.1f}s, "
+            f"{imported / elapsed if elapsed else 0:,.0f} rows/s"
+        ))
+
+    def relay_progress(self, updates, futures):
+        # Workers report through the queue; only this process writes to stdout.
+        running = list(futures)
+        while running:
+            try:
+                self.progress(*updates.get(timeout=0.5))
+            except queue.Empty:
+                running = [future for future in running if not future.done()]
+        while not updates.empty():
+            self.progress(*updates.get())
+
+    def progress(self, label, imported, rejected, elapsed):
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(f"{label}: {imported} rows, {rejected} rejected, {rate:,.0f} rows/s")
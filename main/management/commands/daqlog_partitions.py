@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from main import partitions
+from main.models import DaqLog
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Invalid month '{value}', expected YYYY-MM.")
+
+
+class Command(BaseCommand):
+    help = 'Manages monthly MySQL range partitions of the DaqLog table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['init', 'extend', 'drop', 'list'])
+        parser.add_argument('--start', help='First month to partition on init (YYYY-MM), defaults to the oldest log')
+        parser.add_argument('--months-ahead', type=int, default=3, help='Future months to pre-create')
+        parser.add_argument('--before', help='Drop partitions for months before this one (YYYY-MM)')
+
+    def handle(self, *args, **options):
+        action = options['action']
+        today = timezone.localdate()
+        last_month = partitions.month_start(today)
+        for _ in range(options['months_ahead']):
+            last_month = partitions.next_month(last_month)
+
+        try:
+            if action == 'init':
+                if options['start']:
+                    first_month = parse_month(options['start'])
+                else:
+                    oldest = DaqLog.objects.aggregate(oldest=Min('timestamp'))['oldest']
+                    first_month = partitions.month_start(timezone.localtime(oldest).date() if oldest else today)
+                partitions.create_partitions(first_month, last_month)
+                self.stdout.write(self.style.SUCCESS(
+                    f"Partitioned {partitions.TABLE} from {first_month:%Y-%m} to {last_month:%Y-%m}."
+                ))
+
+            elif action == 'extend':
+                added = partitions.extend_partitions(last_month)
+                self.stdout.write(self.style.SUCCESS(f"Added partitions: {', '.join(added) or 'none'}"))
+
+            elif action == 'drop':
+                if not options['before']:
+                    raise CommandError("--before is required for drop.")
+                dropped = partitions.drop_partitions(parse_month(options['before']))
+                self.stdout.write(self.style.SUCCESS(f"Dropped partitions: {', '.join(dropped) or 'none'}"))
+
+            else:
+                for name, bound, rows in partitions.list_partitions():
+                    self.stdout.write(f"{name}\t{bound}\t{rows}")
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
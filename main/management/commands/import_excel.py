@@ -1,88 +1,101 @@
+import time
+from pathlib import Path
+
 import pandas as pd
 from django.core.management.base import BaseCommand
-from main.models import ProductionLine, Tag, Log, Alert
+from django.db import transaction
+from django.utils import timezone
+
+from main import topology
+from main.dbutils import bulk_upsert
+from main.ingest import after_write
+from main.loaders import localize, read_sheet, resolve_sensor_tags, sensor_tag_lookup
+from main.models import Alert, DaqLog, Line
+
+DEFAULT_FILE = Path(__file__).resolve().parent / 'log_data_15min_interval_new_v5.xlsx'
+
 
 class Command(BaseCommand):
     help = 'Imports data from an Excel file into the database'
 
-    def handle(self, *args, **kwargs):
-        # Load the Excel file
-        file_path = 'main\management\commands\log_data_15min_interval_new_v5.xlsx'
-        excel_data = pd.ExcelFile(file_path)
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', default=str(DEFAULT_FILE))
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        excel_data = pd.ExcelFile(options['file'])
+        tag_sheet = read_sheet(excel_data, 'Tag')
+        lookup = sensor_tag_lookup()
 
-        # Import data from the 'ProductionLine' sheet
-        if 'ProductionLine' in excel_data.sheet_names:
-            pl_data = pd.read_excel(file_path, sheet_name='ProductionLine')
-            for _, row in pl_data.iterrows():
-                ProductionLine.objects.update_or_create(
-                    id=row['id'],
-                    defaults={
-                        'name': row['name'],
-                        'status': row['status'],
-                        'inactive': row['inactive'],
-                        'modified': row['modified']
-                    }
-                )
+        with transaction.atomic():
+            # Lines need a Block, which the workbook does not carry, so only
+            # lines that already exist are updated.
+            pl_data = read_sheet(excel_data, 'ProductionLine')
+            if pl_data is not None:
+                lines = Line.objects.in_bulk(pl_data['id'].tolist())
+                modified = timezone.now()
+                for row in pl_data.itertuples(index=False):
+                    line = lines.get(row.id)
+                    if line is not None:
+                        line.name, line.status, line.inactive = row.name, row.status, bool(row.inactive)
+                        line.modified = modified
+                # bulk_update() neither fills auto_now fields nor sends
+                # post_save: modified moves the topology version for every
+                # worker, and the bump makes this one re-read it after commit.
+                Line.objects.bulk_update(lines.values(), ['name', 'status', 'inactive', 'modified'], batch_size=batch_size)
+                transaction.on_commit(topology.bump_version)
+                self.report('lines', len(lines), len(pl_data))
 
-        # Import data from the 'Tag' sheet
-        if 'Tag' in excel_data.sheet_names:
-            tag_data = pd.read_excel(file_path, sheet_name='Tag')
-            for _, row in tag_data.iterrows():
-                Tag.objects.update_or_create(
-                    id=row['id'],
-                    defaults={
-                        'name': row['name'],
-                        'units': row['units'],
-                        'min_val': row['min_val'],
-                        'max_val': row['max_val'],
-                        'inactive': row['inactive'],
-                        'modified': row['modified']
-                    }
-                )
+            log_data = read_sheet(excel_data, 'Log')
+            if log_data is not None:
+                total = len(log_data.index)
+                log_data['sensor_tag_id'] = resolve_sensor_tags(log_data, tag_sheet, lookup)
+                log_data = log_data.dropna(subset=['sensor_tag_id'])
+                log_data['timestamp'] = localize(log_data['timestamp'])
+                logs = [
+                    DaqLog(id=log_id, timestamp=timestamp, tag_id=int(tag_id), value=value, inactive=bool(inactive))
+                    for log_id, timestamp, tag_id, value, inactive in zip(
+                        log_data['id'].tolist(),
+                        log_data['timestamp'].dt.to_pydatetime(),
+                        log_data['sensor_tag_id'].tolist(),
+                        log_data['value'].tolist(),
+                        log_data['inactive'].tolist(),
+                    )
+                ]
+                bulk_upsert(DaqLog, logs, ['id'], ['timestamp', 'tag', 'value', 'inactive', 'modified'], batch_size)
+                # Historic rows: latest values only, no alerts or push.
+                after_write([log.tag_id for log in logs], [log.timestamp for log in logs],
+                            [log.value for log in logs], live=False)
+                self.report('logs', len(logs), total)
 
-        # Import data from the 'Log' sheet
-        if 'Log' in excel_data.sheet_names:
-            log_data = pd.read_excel(file_path, sheet_name='Log')
-            for _, row in log_data.iterrows():
-                line = ProductionLine.objects.get(id=row['line_id'])
-                tag = Tag.objects.get(id=row['tag_id'])
-                Log.objects.update_or_create(
-                    id=row['id'],
-                    defaults={
-                        'timestamp': row['timestamp'],
-                        'line': line,
-                        'tag': tag,
-                        'value': row['value'],
-                        'inactive': row['inactive'],
-                        'modified': row['modified']
-                    }
-                )
+            alert_data = read_sheet(excel_data, 'Alert')
+            if alert_data is not None:
+                total = len(alert_data.index)
+                alert_data['sensor_tag_id'] = resolve_sensor_tags(alert_data, tag_sheet, lookup)
+                alert_data = alert_data.dropna(subset=['line_id', 'sensor_tag_id'])
+                alerts = [
+                    Alert(id=alert_id, name=name, type=alert_type, timestamp=timestamp.time(),
+                          line_id=int(line_id), tag_id=int(tag_id))
+                    for alert_id, name, alert_type, timestamp, line_id, tag_id in zip(
+                        alert_data['id'].tolist(),
+                        alert_data['name'].tolist(),
+                        alert_data['type'].tolist(),
+                        pd.to_datetime(alert_data['timestamp']),
+                        alert_data['line_id'].tolist(),
+                        alert_data['sensor_tag_id'].tolist(),
+                    )
+                ]
+                bulk_upsert(Alert, alerts, ['id'], ['name', 'type', 'timestamp', 'line', 'tag', 'modified'], batch_size)
+                self.report('alerts', len(alerts), total)
 
-        # Import data from the 'Alert' sheet
-        if 'Alert' in excel_data.sheet_names:
-            alert_data = pd.read_excel(file_path, sheet_name='Alert')
-            for _, row in alert_data.iterrows():
-                line = ProductionLine.objects.get(id=row['line_id'])
-                tag = Tag.objects.get(id=row['tag_id'])
-                Alert.objects.update_or_create(
-                    id=row['id'],
-                    defaults={
-                        'name': row['name'],
-                        'type': row['type'],
-                        'timestamp': row['timestamp'],
-                        'line': line,
-                        'tag': tag,
-                        'report_title': row['report_title'],
-                        'report_type': row['report_type'],
-                        'report_category': row['report_category'],
-                        'report_sub_cat': row['report_sub_cat'],
-                        'location': row['location'],
-                        'incident_dtls': row['incident_dtls'],
-                        'issued': row['issued'],
-                        'role': row['role'],
-                        'inactive': row['inactive'],
-                        'modified': row['modified']
-                    }
-                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported data from Excel file in {time.monotonic() - started:.1f}s'
+        ))
 
-        self.stdout.write(self.style.SUCCESS('Successfully imported data from Excel file'))
+    def report(self, name, imported, total):
+        message = f'Imported {imported} {name}'
+        if imported < total:
+            message += f' ({total - imported} skipped, no matching line or sensor tag)'
+        self.stdout.write(message)
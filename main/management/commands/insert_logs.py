@@ -1,42 +1,54 @@
+import time
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta
-from main.models import ProductionLine, Tag, Log
+
+from main.ingest import write_daqlogs
+from main.loaders import read_sheet, resolve_sensor_tags, sensor_tag_lookup
+
+DEFAULT_FILE = Path(__file__).resolve().parent / 'log_data_15min_interval_new_v5.xlsx'
+DAYS = 7
+INTERVALS_PER_DAY = 96
+RECORDS_PER_INTERVAL = 96
+
 
 class Command(BaseCommand):
     help = 'Imports data from an Excel file into the database'
 
-    def handle(self, *args, **kwargs):
-        file_path = 'main/management/commands/log_data_15min_interval_new_v5.xlsx'
-        log_data = pd.read_excel(file_path, sheet_name='Log')
-        
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', default=str(DEFAULT_FILE))
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        excel_data = pd.ExcelFile(options['file'])
+        log_data = read_sheet(excel_data, 'Log')
+
+        if len(log_data.index) != DAYS * INTERVALS_PER_DAY * RECORDS_PER_INTERVAL:
+            self.stdout.write(self.style.ERROR("The number of generated timestamps does not match the number of records in the Excel sheet."))
+            return
+
+        # Each 15-minute interval holds RECORDS_PER_INTERVAL consecutive rows,
+        # starting at midnight today.
         now = timezone.now()
         start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        current_timestamp = start_date
+        offsets = (np.arange(len(log_data.index)) // RECORDS_PER_INTERVAL) * np.timedelta64(15, 'm')
+        timestamps = pd.Timestamp(start_date) + pd.to_timedelta(offsets)
 
-        timestamps = []
+        tag_ids = resolve_sensor_tags(log_data, read_sheet(excel_data, 'Tag'), sensor_tag_lookup())
+        resolved = tag_ids.notna().to_numpy()
+        if not resolved.all():
+            self.stdout.write(self.style.WARNING(f"Skipping {(~resolved).sum()} records with no matching sensor tag."))
 
-        for day in range(7):
-            for record_set in range(96):
-                timestamps.extend([current_timestamp] * 96)
-                current_timestamp += timedelta(minutes=15)
+        inserted = write_daqlogs(
+            tag_ids[resolved].astype(np.int64).tolist(),
+            timestamps[resolved],
+            log_data['value'][resolved].tolist(),
+            live=False,
+        )
 
-        if len(timestamps) != len(log_data):
-            self.stdout.write(self.style.ERROR("The number of generated timestamps does not match the number of records in the Excel sheet."))
-            return
-        
-        for i, (_, row) in enumerate(log_data.iterrows()):
-            line = ProductionLine.objects.get(id=row['line_id'])
-            tag = Tag.objects.get(id=row['tag_id'])
-            
-            Log.objects.create(
-                timestamp=timestamps[i],
-                line=line,
-                tag=tag,
-                value=row['value'],
-                inactive=row['inactive'],
-                modified=row['modified']
-            )
-
-        self.stdout.write(self.style.SUCCESS('Data import completed successfully.'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Data import completed successfully: {inserted} logs in {time.monotonic() - started:.1f}s.'
+        ))
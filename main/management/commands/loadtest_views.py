@@ -0,0 +1,92 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+
+
+async def _request(application, url):
+    parts = urlsplit(url)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': parts.path,
+        'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    done = asyncio.Event()
+    result = {'status': None, 'bytes': 0}
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            result['bytes'] += len(message.get('body', b''))
+            if not message.get('more_body'):
+                done.set()
+
+    await application(scope, receive, send)
+    done.set()
+    return result
+
+
+async def _run(application, url, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            result = await _request(application, url)
+            latencies.append(time.perf_counter() - started)
+            return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - started, latencies, results
+
+
+class Command(BaseCommand):
+    help = (
+        'Fires concurrent GET requests at the in-process ASGI application and reports '
+        'requests/s and latency, e.g. to compare /api/production-metrics/ with /api/async/production-metrics/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Paths with query strings, such as /api/async/alerts/?Line=1')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    def handle(self, *args, **options):
+        application = get_asgi_application()
+        for url in options['urls']:
+            # Warm up caches and connections before measuring.
+            asyncio.run(_run(application, url, min(options['concurrency'], options['requests']), options['concurrency']))
+            elapsed, latencies, results = asyncio.run(
+                _run(application, url, options['requests'], options['concurrency'])
+            )
+            failed = sum(1 for result in results if not 200 <= (result['status'] or 0) < 300)
+            latencies.sort()
+            self.stdout.write(
+                f"{url}\n"
+                f"  {len(results) / elapsed:,.0f} req/s, p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, {failed} non-2xx"
+            )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Incrementally folds new DaqLog rows into the 1m/15m/1h/1d rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            processed = refresh_rollups(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Rolled up {processed} logs in {time.monotonic() - started:.1f}s"
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
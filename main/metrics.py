@@ -0,0 +1,300 @@
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from . import shifts, topology
+from .archive import retention_cutoff
+from .models import DaqLog, DaqLogRollup, DaqLogRollupState, Line, SensorTag
+from .rollups import RESOLUTIONS
+from .shifts import localize
+
+GOOD_QUALITY = 0.95
+
+INTERVALS = ('hour', 'shift', 'day')
+
+# Counter rollups used for series; 15 minutes lines up with the local hour in
+# every common timezone.
+SERIES_ROLLUP = '15m'
+
+
+def kpi_aggregates():
+    # All KPI components come out of a single scan of the DaqLog range.
+    return {
+        'production': Sum('value', filter=Q(tag__metric_role=SensorTag.PRODUCTION)),
+        'downtime': Sum('value', filter=Q(tag__metric_role=SensorTag.DOWNTIME)),
+        'quality_total': Sum('value', filter=Q(tag__metric_role=SensorTag.QUALITY)),
+        'quality_good': Sum('value', filter=Q(tag__metric_role=SensorTag.QUALITY, value__gte=GOOD_QUALITY)),
+    }
+
+
+def kpi_logs(line_id, start_date, end_date):
+    return DaqLog.objects.filter(
+        tag__machine__line_id=line_id,
+        tag__metric_role__isnull=False,
+        timestamp__range=(start_date, end_date)
+    )
+
+
+def compute_metrics(line, start_date, end_date, totals):
+    total_time = (end_date - start_date).total_seconds() / 3600  # in hours
+
+    production = totals['production'] or 0
+    downtime = totals['downtime'] or 0
+
+    production_rate = production / total_time if total_time > 0 else 0
+    availability = (total_time - downtime) / total_time if total_time > 0 else 0
+
+    # Efficiency calculation
+    target_production = line.target_production * total_time
+    efficiency = production / target_production if target_production > 0 else 0
+
+    # Quality calculation
+    good_products = totals['quality_good'] or 0
+    total_products = totals['quality_total'] or 0
+    quality = good_products / total_products if total_products > 0 else 0
+
+    return {
+        "line_name": line.name,
+        "production": round(production, 1),
+        "production_rate": round(production_rate, 1),
+        "efficiency": round(efficiency, 1),
+        "downtime": downtime,
+        "availability": availability,
+        "quality": quality
+    }
+
+
+def line_metrics(line, start_date, end_date):
+    totals = kpi_logs(line.id, start_date, end_date).aggregate(**kpi_aggregates())
+    return compute_metrics(line, start_date, end_date, totals)
+
+
+def aware(value):
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def check_retention(start_date):
+    """Raise ValueError for windows reaching into months moved to the archive.
+
+    archive_daqlogs deletes those raw rows, so KPIs over them would silently
+    come out as no production and full availability.
+    """
+    cutoff = retention_cutoff()
+    if aware(start_date) < cutoff:
+        raise ValueError(f"Metrics are only available from {cutoff.isoformat()}; older readings are archived.")
+
+
+def align_window(start_date, end_date):
+    """Snap a window to the cache grid so repeated dashboard refreshes share a key."""
+    start_date, end_date = aware(start_date), aware(end_date)
+    step = getattr(settings, 'METRICS_CACHE_ALIGN_SECONDS', 10)
+    aligned_start = start_date - timedelta(seconds=start_date.timestamp() % step)
+    aligned_end = end_date - timedelta(seconds=end_date.timestamp() % step)
+    if aligned_start >= aligned_end:
+        return start_date, end_date
+    return aligned_start, aligned_end
+
+
+def cache_timeout(end_date):
+    # Windows that closed before the settle delay no longer receive data and
+    # are kept until evicted; open windows expire after the refresh TTL.
+    settle = getattr(settings, 'METRICS_CACHE_SETTLE_SECONDS', 300)
+    if end_date <= timezone.now() - timedelta(seconds=settle):
+        return None
+    return getattr(settings, 'METRICS_CACHE_TTL', 10)
+
+
+def metrics_key(line_id, start_date, end_date, version):
+    # The topology version covers edits to the line's target or its tags.
+    return f'metrics:line:{line_id}:{version}:{start_date.timestamp():.6f}:{end_date.timestamp():.6f}'
+
+
+def cached_line_metrics(line_id, start_date, end_date):
+    start_date, end_date = align_window(start_date, end_date)
+    key = metrics_key(line_id, start_date, end_date, topology.get_version())
+
+    metrics = cache.get(key)
+    if metrics is None:
+        line = Line.objects.get(id=line_id)
+        metrics = line_metrics(line, start_date, end_date)
+        cache.set(key, metrics, cache_timeout(end_date))
+    return metrics
+
+
+async def acached_line_metrics(line_id, start_date, end_date):
+    """cached_line_metrics() for async views, sharing its cache entries."""
+    start_date, end_date = align_window(start_date, end_date)
+    key = metrics_key(line_id, start_date, end_date, await sync_to_async(topology.get_version)())
+
+    metrics = await cache.aget(key)
+    if metrics is None:
+        line = await Line.objects.aget(id=line_id)
+        totals = await kpi_logs(line.id, start_date, end_date).aaggregate(**kpi_aggregates())
+        metrics = compute_metrics(line, start_date, end_date, totals)
+        await cache.aset(key, metrics, cache_timeout(end_date))
+    return metrics
+
+
+def _shift_step():
+    # METRICS_SHIFT_HOURS is expected to divide a day.
+    return pd.Timedelta(hours=getattr(settings, 'METRICS_SHIFT_HOURS', 8))
+
+
+def _floor(stamps, interval):
+    """Start of the hour, shift or day holding each local-time stamp."""
+    wall_times = stamps.tz_localize(None)
+    if interval == 'hour':
+        # Subtracting the time past the local hour keeps the repeated hour at a
+        # DST change as two buckets.
+        return stamps - (wall_times - wall_times.floor('h'))
+
+    days = wall_times.normalize()
+    if interval == 'day':
+        return localize(days, stamps.tz)
+    offset = pd.Timedelta(hours=getattr(settings, 'METRICS_SHIFT_START_HOUR', 6))
+    step = _shift_step()
+    return localize(days + ((wall_times - days - offset) // step) * step + offset, stamps.tz)
+
+
+def bucket_windows(start_date, end_date, interval):
+    """[(start, end)] of every fixed hour, shift or day touching the window, clipped to it."""
+    tz = timezone.get_current_timezone()
+    start, end = pd.Timestamp(start_date).tz_convert(tz), pd.Timestamp(end_date).tz_convert(tz)
+    bucket = _floor(pd.DatetimeIndex([start]), interval)[0]
+    windows = []
+    while bucket < end:
+        if interval == 'hour':
+            following = bucket + pd.Timedelta(hours=1)
+        else:
+            step = pd.Timedelta(days=1) if interval == 'day' else _shift_step()
+            following = localize(pd.DatetimeIndex([bucket.tz_localize(None) + step]), tz)[0]
+        windows.append((max(bucket, start), min(following, end)))
+        bucket = following
+    return windows
+
+
+def line_windows(line_id, start_date, end_date, interval):
+    """[(start, end, labels)] of the series buckets for a line.
+
+    Shifts and days follow the line's shift calendar when it has one; the
+    labels then name the shift and production day of each bucket.
+    """
+    calendar = shifts.calendar_for_line(line_id)
+    if calendar is None or interval == 'hour':
+        return [(start, end, {}) for start, end in bucket_windows(start_date, end_date, interval)]
+    if interval == 'day':
+        return [
+            (start, end, {'day': day.isoformat()})
+            for start, end, _, day in shifts.days_between(calendar, start_date, end_date)
+        ]
+    return [
+        (start, end, {'shift': name, 'day': day.isoformat()})
+        for start, end, name, day in shifts.shifts_between(calendar, start_date, end_date)
+    ]
+
+
+def _series_rows(line_id, start_date, end_date, edges=()):
+    """(tag_id, timestamp, value) rows whose per-bucket sums give the KPI components.
+
+    Production and downtime come from the 15 minute rollups for the part of
+    the window they cover completely, plus raw rows for the ragged edges and
+    for rows written since the last rollup run. A rollup bucket cut by one of
+    edges (bucket boundaries inside the window, e.g. a 06:10 shift start) is
+    also read raw, so its rows land on the right side of the cut. Quality
+    needs per-reading values and is always read raw.
+    """
+    roles = dict(SensorTag.objects.filter(machine__line_id=line_id, metric_role__isnull=False).values_list('id', 'metric_role'))
+    counters = [tag_id for tag_id, role in roles.items() if role != SensorTag.QUALITY]
+    rolled_up_to = DaqLogRollupState.objects.filter(id=1).values_list('last_log_id', flat=True).first()
+
+    seconds = RESOLUTIONS[SERIES_ROLLUP]
+    step = timedelta(seconds=seconds)
+    head = pd.Timestamp(start_date).ceil(f'{seconds}s').to_pydatetime()
+    tail = pd.Timestamp(end_date).floor(f'{seconds}s').to_pydatetime()
+    records = []
+
+    if rolled_up_to is not None and counters and head < tail:
+        floors = ((edge, pd.Timestamp(edge).floor(f'{seconds}s')) for edge in edges)
+        split = {bucket.to_pydatetime() for edge, bucket in floors if bucket != edge and head <= bucket < tail}
+        records += [
+            row for row in DaqLogRollup.objects.filter(
+                tag_id__in=counters, resolution=SERIES_ROLLUP, bucket__gte=head, bucket__lt=tail,
+            ).values_list('tag_id', 'bucket', 'sum_value')
+            if row[1] not in split
+        ]
+        raw = Q(tag_id__in=[tag_id for tag_id in roles if tag_id not in counters]) | Q(
+            Q(timestamp__lt=head) | Q(timestamp__gte=tail) | Q(id__gt=rolled_up_to),
+            tag_id__in=counters,
+        )
+        # The rolled up rows of split buckets; rows above the watermark are
+        # already read above.
+        split = sorted(split)
+        size = getattr(settings, 'DAQLOG_ROLLUP_RANGES_PER_QUERY', 200)
+        for offset in range(0, len(split), size):
+            records += DaqLog.objects.filter(
+                reduce(or_, (Q(timestamp__gte=bucket, timestamp__lt=bucket + step) for bucket in split[offset:offset + size])),
+                tag_id__in=counters, id__lte=rolled_up_to,
+            ).values_list('tag_id', 'timestamp', 'value')
+    else:
+        raw = Q(tag_id__in=list(roles))
+
+    records += DaqLog.objects.filter(raw, timestamp__range=(start_date, end_date)).values_list('tag_id', 'timestamp', 'value')
+    return roles, records
+
+
+def line_metrics_series(line, start_date, end_date, interval):
+    """compute_metrics() for every hour, shift or day bucket of the window."""
+    windows = line_windows(line.id, start_date, end_date, interval)
+    edges = [start for start, _, _ in windows] + [end for _, end, _ in windows]
+    roles, records = _series_rows(line.id, start_date, end_date, edges) if windows else ({}, [])
+
+    components = ['production', 'downtime', 'quality_total', 'quality_good']
+    frame = pd.DataFrame.from_records(records, columns=['tag_id', 'timestamp', 'value'])
+    role = frame['tag_id'].map(roles)
+    value = frame['value'].astype(float)
+    quality = role == SensorTag.QUALITY
+    totals = pd.DataFrame({
+        'production': value.where(role == SensorTag.PRODUCTION, 0),
+        'downtime': value.where(role == SensorTag.DOWNTIME, 0),
+        'quality_total': value.where(quality, 0),
+        'quality_good': value.where(quality & (value >= GOOD_QUALITY), 0),
+    }, columns=components)
+
+    # Readings go to the bucket starting last at or before them; the window
+    # end itself is inclusive, as in line_metrics().
+    stamps = pd.DatetimeIndex(pd.to_datetime(frame['timestamp'], utc=True)).as_unit('ns').asi8
+    starts = pd.DatetimeIndex([start for start, _, _ in windows]).as_unit('ns').asi8
+    ends = pd.DatetimeIndex([end for _, end, _ in windows]).as_unit('ns').asi8
+    position = np.searchsorted(starts, stamps, side='right') - 1
+    bounded = np.maximum(position, 0)
+    inside = (position >= 0) & ((stamps < ends[bounded]) | ((bounded == len(windows) - 1) & (stamps == ends[bounded])))
+    totals = totals[inside].groupby(position[inside]).sum().reindex(range(len(windows)), fill_value=0)
+
+    buckets = []
+    for (window_start, window_end, labels), row in zip(windows, totals.to_dict('records')):
+        metrics = compute_metrics(line, window_start.to_pydatetime(), window_end.to_pydatetime(), row)
+        del metrics['line_name']
+        buckets.append({'start': window_start.isoformat(), 'end': window_end.isoformat(), **labels, **metrics})
+
+    return {'line_name': line.name, 'interval': interval, 'buckets': buckets}
+
+
+def cached_line_metrics_series(line_id, start_date, end_date, interval):
+    start_date, end_date = align_window(start_date, end_date)
+    # Bucket edges follow the active timezone.
+    key = f'{metrics_key(line_id, start_date, end_date, topology.get_version())}:{interval}:{timezone.get_current_timezone_name()}'
+
+    series = cache.get(key)
+    if series is None:
+        line = Line.objects.get(id=line_id)
+        series = line_metrics_series(line, start_date, end_date, interval)
+        cache.set(key, series, cache_timeout(end_date))
+    return series
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_alert_inactive_alert_modified_alert_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='daqlog',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.sensortag'),
+        ),
+        migrations.AddIndex(
+            model_name='daqlog',
+            index=models.Index(fields=['tag', 'timestamp'], name='ap_daqlog_tag_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='daqlog',
+            index=models.Index(fields=['timestamp', 'id'], name='ap_daqlog_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidenttransaction',
+            index=models.Index(fields=['timestamp', 'id'], name='ap_incidenttx_ts_id_idx'),
+        ),
+    ]
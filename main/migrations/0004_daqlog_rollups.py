@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_daqlog_tag_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaqLogRollupState',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('last_log_id', models.BigIntegerField(default=0)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'ap_DaqLogRollupState',
+                'verbose_name_plural': 'ap_DaqLogRollupStates',
+                'db_table': 'ap_DaqLogRollupState',
+            },
+        ),
+        migrations.CreateModel(
+            name='DaqLogRollup',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('15m', '15 minutes'), ('1h', '1 hour'), ('1d', '1 day')], max_length=3)),
+                ('bucket', models.DateTimeField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('avg_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('count', models.IntegerField()),
+                ('first_value', models.FloatField()),
+                ('last_value', models.FloatField()),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.sensortag')),
+            ],
+            options={
+                'verbose_name': 'ap_DaqLogRollup',
+                'verbose_name_plural': 'ap_DaqLogRollups',
+                'db_table': 'ap_DaqLogRollup',
+                'constraints': [models.UniqueConstraint(fields=('tag', 'resolution', 'bucket'), name='ap_daqlogrollup_bucket_uniq')],
+            },
+        ),
+    ]
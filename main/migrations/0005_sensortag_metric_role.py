@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+# Same substrings the metric views used to match on, in precedence order.
+ROLE_KEYWORDS = [
+    ('production', 'Production'),
+    ('downtime', 'Downtime'),
+    ('quality', 'Quality'),
+]
+
+
+def backfill_metric_role(apps, schema_editor):
+    SensorTag = apps.get_model('main', 'SensorTag')
+    for role, keyword in ROLE_KEYWORDS:
+        SensorTag.objects.filter(metric_role__isnull=True, name__icontains=keyword).update(metric_role=role)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_daqlog_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensortag',
+            name='metric_role',
+            field=models.CharField(blank=True, choices=[('production', 'Production'), ('downtime', 'Downtime'), ('quality', 'Quality')], db_index=True, max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_metric_role, migrations.RunPython.noop),
+    ]
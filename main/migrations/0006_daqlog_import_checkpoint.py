@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_sensortag_metric_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaqLogImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('source', models.CharField(max_length=255)),
+                ('tag_ranges', models.CharField(blank=True, default='', max_length=1000)),
+                ('positions', models.JSONField(default=dict)),
+                ('imported', models.BigIntegerField(default=0)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'ap_DaqLogImportCheckpoint',
+                'verbose_name_plural': 'ap_DaqLogImportCheckpoints',
+                'db_table': 'ap_DaqLogImportCheckpoint',
+                'constraints': [models.UniqueConstraint(fields=('source',), name='ap_daqlogimport_source_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_daqlog_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorTagLatest',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='main.sensortag')),
+                ('timestamp', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('modified', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'ap_SensorTagLatest',
+                'verbose_name_plural': 'ap_SensorTagLatest',
+                'db_table': 'ap_SensorTagLatest',
+            },
+        ),
+    ]
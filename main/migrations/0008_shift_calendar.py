@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+import django.db.models.deletion
+import main.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_sensortaglatest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftCalendar',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('timezone', models.CharField(blank=True, default='', max_length=64, validators=[main.models.validate_timezone])),
+                ('inactive', models.BooleanField(default=False)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('block', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='main.block')),
+                ('plant', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='main.plant')),
+            ],
+            options={
+                'verbose_name': 'ap_ShiftCalendar',
+                'verbose_name_plural': 'ap_ShiftCalendars',
+                'db_table': 'ap_ShiftCalendar',
+            },
+        ),
+        migrations.CreateModel(
+            name='Shift',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('weekdays', models.CharField(default='0123456', max_length=7, validators=[main.models.validate_weekdays])),
+                ('inactive', models.BooleanField(default=False)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.shiftcalendar')),
+            ],
+            options={
+                'verbose_name': 'ap_Shift',
+                'verbose_name_plural': 'ap_Shifts',
+                'db_table': 'ap_Shift',
+                'constraints': [models.UniqueConstraint(fields=('calendar', 'name'), name='ap_shift_calendar_name_uniq')],
+            },
+        ),
+    ]
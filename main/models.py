@@ -1,5 +1,19 @@
+import zoneinfo
+
+from django.core.exceptions import ValidationError
 from django.db import models
 
+
+def validate_timezone(value):
+    if value and value not in zoneinfo.available_timezones():
+        raise ValidationError(f"{value} is not a known time zone.")
+
+
+def validate_weekdays(value):
+    if not set(value) <= set('0123456') or len(set(value)) != len(value):
+        raise ValidationError(f"{value} must list distinct weekday digits, 0 (Monday) to 6.")
+
+
 class AuthRole(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=50, unique=True)
@@ -122,6 +136,15 @@ class SensorTagType(models.Model):
 
 
 class SensorTag(models.Model):
+    PRODUCTION = 'production'
+    DOWNTIME = 'downtime'
+    QUALITY = 'quality'
+    METRIC_ROLE_CHOICES = [
+        (PRODUCTION, 'Production'),
+        (DOWNTIME, 'Downtime'),
+        (QUALITY, 'Quality'),
+    ]
+
     id = models.AutoField(primary_key=True)
     machine = models.ForeignKey(Machine, on_delete=models.DO_NOTHING)
     tag_type = models.ForeignKey(SensorTagType, on_delete=models.DO_NOTHING)
@@ -132,6 +155,7 @@ class SensorTag(models.Model):
     threshold_alert = models.CharField(max_length=100)
     continuous_record = models.BooleanField(default=False)
     frequency = models.CharField(max_length=100, null=True, blank=True)
+    metric_role = models.CharField(max_length=20, choices=METRIC_ROLE_CHOICES, null=True, blank=True, db_index=True)
     inactive = models.BooleanField(default=False)
     modified = models.DateTimeField(auto_now=True)
 
@@ -156,11 +180,30 @@ class DaqLog(models.Model):
         db_table = 'ap_DaqLog'
         verbose_name = "ap_DaqLog"
         verbose_name_plural = "ap_DaqLogs"
+        indexes = [
+            models.Index(fields=['tag', 'timestamp'], name='ap_daqlog_tag_ts_idx'),
+            models.Index(fields=['timestamp', 'id'], name='ap_daqlog_ts_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.timestamp} - {self.tag.machine.line.block.plant.name} - {self.tag.machine.line.name} - {self.tag.machine.name} - {self.tag.name} - {self.value}"
 
 
+class SensorTagLatest(models.Model):
+    tag = models.OneToOneField(SensorTag, on_delete=models.CASCADE, primary_key=True)
+    timestamp = models.DateTimeField()
+    value = models.FloatField()
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        db_table = 'ap_SensorTagLatest'
+        verbose_name = "ap_SensorTagLatest"
+        verbose_name_plural = "ap_SensorTagLatest"
+
+    def __str__(self):
+        return f"{self.tag.name} - {self.timestamp} - {self.value}"
+
+
 class Alert(models.Model):
     id = models.AutoField(primary_key=True)
     line = models.ForeignKey(Line, on_delete=models.DO_NOTHING)
@@ -214,6 +257,122 @@ class IncidentTransaction(models.Model):
         db_table = 'ap_IncidentTransaction'
         verbose_name = "ap_IncidentTransaction"
         verbose_name_plural = "ap_IncidentTransactions"
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='ap_incidenttx_ts_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.timestamp} - {self.issued_by.name} - {self.msg}"
+
+
+class DaqLogRollup(models.Model):
+    RESOLUTION_CHOICES = [
+        ('1m', '1 minute'),
+        ('15m', '15 minutes'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    tag = models.ForeignKey(SensorTag, on_delete=models.CASCADE)
+    resolution = models.CharField(max_length=3, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    avg_value = models.FloatField()
+    sum_value = models.FloatField()
+    count = models.IntegerField()
+    first_value = models.FloatField()
+    last_value = models.FloatField()
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ap_DaqLogRollup'
+        verbose_name = "ap_DaqLogRollup"
+        verbose_name_plural = "ap_DaqLogRollups"
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'resolution', 'bucket'], name='ap_daqlogrollup_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket} - {self.resolution} - {self.tag.name} - {self.avg_value}"
+
+
+class DaqLogRollupState(models.Model):
+    id = models.AutoField(primary_key=True)
+    last_log_id = models.BigIntegerField(default=0)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ap_DaqLogRollupState'
+        verbose_name = "ap_DaqLogRollupState"
+        verbose_name_plural = "ap_DaqLogRollupStates"
+
+    def __str__(self):
+        return f"{self.last_log_id} - {self.modified}"
+
+
+class DaqLogImportCheckpoint(models.Model):
+    # tag_ranges is the worker split fixed on the first run ("1-8,9-" or ''
+    # for a single worker); positions maps each range to the rows consumed.
+    id = models.AutoField(primary_key=True)
+    source = models.CharField(max_length=255)
+    tag_ranges = models.CharField(max_length=1000, blank=True, default='')
+    positions = models.JSONField(default=dict)
+    imported = models.BigIntegerField(default=0)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ap_DaqLogImportCheckpoint'
+        verbose_name = "ap_DaqLogImportCheckpoint"
+        verbose_name_plural = "ap_DaqLogImportCheckpoints"
+        constraints = [
+            models.UniqueConstraint(fields=['source'], name='ap_daqlogimport_source_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} [{self.tag_ranges}] - {self.imported}"
+
+
+class ShiftCalendar(models.Model):
+    # A calendar applies to every line of its plant, or only to one block's
+    # lines when block is set; a block calendar takes precedence.
+    id = models.AutoField(primary_key=True)
+    plant = models.ForeignKey(Plant, on_delete=models.DO_NOTHING)
+    block = models.ForeignKey(Block, on_delete=models.DO_NOTHING, null=True, blank=True)
+    name = models.CharField(max_length=100)
+    timezone = models.CharField(max_length=64, blank=True, default='', validators=[validate_timezone])  # empty: TIME_ZONE
+    inactive = models.BooleanField(default=False)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ap_ShiftCalendar'
+        verbose_name = "ap_ShiftCalendar"
+        verbose_name_plural = "ap_ShiftCalendars"
+
+    def __str__(self):
+        return f"{self.plant.name} - {self.name}"
+
+
+class Shift(models.Model):
+    # A shift ending at or before its start time runs past midnight; it
+    # belongs to the production day it starts on.
+    id = models.AutoField(primary_key=True)
+    calendar = models.ForeignKey(ShiftCalendar, on_delete=models.CASCADE)
+    name = models.CharField(max_length=50)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    weekdays = models.CharField(max_length=7, default='0123456', validators=[validate_weekdays])  # Monday is 0
+    inactive = models.BooleanField(default=False)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ap_Shift'
+        verbose_name = "ap_Shift"
+        verbose_name_plural = "ap_Shifts"
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'name'], name='ap_shift_calendar_name_uniq'),
+        ]
 
     def __str__(self):
-        return f"{self.timestamp} - {self.issued_by.name} - {self.msg}"
\ No newline at end of file
+        return f"{self.calendar.name} - {self.name} ({self.start_time}-{self.end_time})"
@@ -0,0 +1,62 @@
+import json
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import BaseParser
+
+# Stands in for an NDJSON line that is not valid JSON.
+INVALID_JSON = object()
+
+
+class BatchTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Request body is too large.'
+
+
+def batch_max_bytes():
+    return getattr(settings, 'DAQLOG_BATCH_MAX_BYTES', 32 * 1024 * 1024)
+
+
+def read_batch(stream, parser_context):
+    """The decoded request body, up to DAQLOG_BATCH_MAX_BYTES.
+
+    Reads the stream itself instead of request.body, so batch uploads are not
+    held to DATA_UPLOAD_MAX_MEMORY_SIZE, which is sized for form posts.
+    """
+    limit = batch_max_bytes()
+    body = stream.read(limit + 1)
+    if len(body) > limit:
+        raise BatchTooLarge(f'Batch bodies are limited to {limit} bytes; split the batch.')
+    encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+    try:
+        return body.decode(encoding)
+    except UnicodeDecodeError as exc:
+        raise ParseError(f'Batch parse error - {exc}')
+
+
+class BatchJSONParser(BaseParser):
+    """JSON bodies for batch uploads, limited by DAQLOG_BATCH_MAX_BYTES."""
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return json.loads(read_batch(stream, parser_context))
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class NDJSONParser(BaseParser):
+    """Parses newline-delimited JSON into a list; undecodable lines become INVALID_JSON."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        rows = []
+        for line in read_batch(stream, parser_context).splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(INVALID_JSON)
+        return rows
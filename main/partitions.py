@@ -0,0 +1,120 @@
+from datetime import date
+
+from django.db import connection
+
+from .models import DaqLog
+
+# Monthly RANGE partitioning of ap_DaqLog on MySQL. Partition "pYYYYMM" holds
+# the rows of that month and "pmax" catches everything past the last one, so
+# expiring a month is a metadata-only DROP PARTITION instead of a DELETE.
+
+TABLE = DaqLog._meta.db_table
+MAX_PARTITION = 'pmax'
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(value):
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+
+def partition_name(month):
+    return f'p{month.year:04d}{month.month:02d}'
+
+
+def partition_clause(month):
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{next_month(month).isoformat()}'))"
+
+
+def month_range(first, last):
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def ensure_mysql():
+    if connection.vendor != 'mysql':
+        raise RuntimeError(f"DaqLog partitioning requires MySQL, not {connection.vendor}.")
+
+
+def list_partitions():
+    ensure_mysql()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS "
+            "FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [TABLE],
+        )
+        return cursor.fetchall()
+
+
+def partitioned_months():
+    months = []
+    for name, _, _ in list_partitions():
+        if name != MAX_PARTITION:
+            months.append(date(int(name[1:5]), int(name[5:7]), 1))
+    return months
+
+
+def create_partitions(first_month, last_month):
+    """Convert ap_DaqLog into a monthly partitioned table covering first..last month."""
+    ensure_mysql()
+    if partitioned_months():
+        raise RuntimeError(f"{TABLE} is already partitioned.")
+
+    clauses = [partition_clause(month) for month in month_range(first_month, last_month)]
+    clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE")
+
+    with connection.cursor() as cursor:
+        # Partitioned InnoDB tables cannot carry foreign keys, and the
+        # partitioning column has to be part of every unique key.
+        cursor.execute(
+            "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [TABLE],
+        )
+        for (constraint,) in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE `{TABLE}` DROP FOREIGN KEY `{constraint}`")
+        cursor.execute(f"ALTER TABLE `{TABLE}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `timestamp`)")
+        cursor.execute(
+            f"ALTER TABLE `{TABLE}` PARTITION BY RANGE (TO_DAYS(`timestamp`)) ({', '.join(clauses)})"
+        )
+
+
+def extend_partitions(last_month):
+    """Split pmax so that every month up to last_month has its own partition."""
+    ensure_mysql()
+    months = partitioned_months()
+    if not months:
+        raise RuntimeError(f"{TABLE} is not partitioned.")
+
+    new_months = month_range(next_month(months[-1]), last_month)
+    if not new_months:
+        return []
+
+    clauses = [partition_clause(month) for month in new_months]
+    clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE `{TABLE}` REORGANIZE PARTITION {MAX_PARTITION} INTO ({', '.join(clauses)})"
+        )
+    return [partition_name(month) for month in new_months]
+
+
+def drop_partitions(before_month):
+    """Drop every monthly partition that ends on or before before_month."""
+    ensure_mysql()
+    names = [partition_name(month) for month in partitioned_months() if month < month_start(before_month)]
+    if names:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE `{TABLE}` DROP PARTITION {', '.join(names)}")
+    return names
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import topology
+from .models import SensorTag
+from .serializers import AlertFastSerializer, format_datetime
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:
+    redis = aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Live readings and alerts for /api/events/ (Server-Sent Events). The ingest
+# path publishes one message per stored batch: a list of events, each
+# (event name, tag id, machine id, line id, payload). Subscribers filter by
+# scope. PUSH_BROKER picks the transport: the default fans out inside one
+# process; RedisBroker shares events between workers over pub/sub.
+
+
+class InProcessBroker:
+    def __init__(self, queue_size=1000):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def has_subscribers(self):
+        return bool(self.subscribers)
+
+    def publish(self, events):
+        # Called from request and flusher threads; each subscriber's queue is
+        # only touched from its own event loop.
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, events)
+            except RuntimeError:
+                # The subscriber's event loop has gone away without closing.
+                self.unsubscribe(subscription)
+
+    def subscribe(self):
+        subscription = _QueueSubscription(self, asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+
+class _QueueSubscription:
+    def __init__(self, broker, loop, queue_size):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+
+    def put(self, events):
+        try:
+            self.queue.put_nowait(events)
+        except asyncio.QueueFull:
+            # A client that cannot keep up loses batches instead of growing memory.
+            logger.warning("Dropping %s events for a slow push subscriber", len(events))
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class RedisBroker:
+    def __init__(self, url=None, channel='prodviz:events'):
+        if redis is None:
+            raise ImproperlyConfigured("RedisBroker requires the redis package.")
+        self.url = url or getattr(settings, 'PUSH_REDIS_URL', 'redis://localhost:6379/0')
+        self.channel = channel
+        self.client = redis.Redis.from_url(self.url)
+
+    def has_subscribers(self):
+        return True
+
+    def publish(self, events):
+        try:
+            self.client.publish(self.channel, json.dumps(events))
+        except redis.RedisError:
+            logger.exception("Could not publish %s events", len(events))
+
+    def subscribe(self):
+        return _RedisSubscription(aioredis.Redis.from_url(self.url), self.channel)
+
+
+class _RedisSubscription:
+    def __init__(self, client, channel):
+        self.client = client
+        self.channel = channel
+        self.pubsub = None
+
+    async def get(self, timeout):
+        if self.pubsub is None:
+            self.pubsub = self.client.pubsub()
+            await self.pubsub.subscribe(self.channel)
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message['data']) if message else None
+
+    async def close(self):
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            broker_class = import_string(getattr(settings, 'PUSH_BROKER', 'main.push.InProcessBroker'))
+            _broker = broker_class()
+    return _broker
+
+
+def _load_tag_scopes():
+    rows = SensorTag.objects.values_list('id', 'machine_id', 'machine__line_id')
+    return {tag_id: (machine_id, line_id) for tag_id, machine_id, line_id in rows}
+
+
+def publish(tag_ids, index, values, alerts=()):
+    """Publish a stored batch of readings (UTC DatetimeIndex) and the alerts it raised."""
+    broker = get_broker()
+    if not broker.has_subscribers():
+        return
+    scopes = topology.versioned('push_tag_scopes', _load_tag_scopes)
+    tz = timezone.get_current_timezone()
+    events = []
+    tag_ids = np.asarray(tag_ids, dtype=np.int64).tolist()
+    values = np.asarray(values, dtype=np.float64).tolist()
+    for tag_id, timestamp, value in zip(tag_ids, index, values):
+        machine_id, line_id = scopes.get(tag_id, (None, None))
+        payload = {'tag': tag_id, 'timestamp': format_datetime(timestamp, tz), 'value': value}
+        events.append(('reading', tag_id, machine_id, line_id, payload))
+    for alert, payload in zip(alerts, AlertFastSerializer(list(alerts), many=True).data):
+        machine_id, line_id = scopes.get(alert.tag_id, (None, alert.line_id))
+        events.append(('alert', alert.tag_id, machine_id, line_id, payload))
+    if events:
+        broker.publish(events)
+
+
+def publish_alerts(alerts):
+    publish([], [], [], alerts)
+
+
+async def event_stream(lines=(), machines=(), tags=()):
+    """SSE text for events in any of the given scopes (all events if none given)."""
+    lines, machines, tags = set(lines), set(machines), set(tags)
+    everything = not (lines or machines or tags)
+    keepalive = getattr(settings, 'PUSH_KEEPALIVE_SECONDS', 15)
+    subscription = get_broker().subscribe()
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            events = await subscription.get(keepalive)
+            if events is None:
+                yield ': keepalive\n\n'
+                continue
+            chunk = ''.join(
+                f'event: {name}\ndata: {json.dumps(payload)}\n\n'
+                for name, tag_id, machine_id, line_id, payload in events
+                if everything or tag_id in tags or machine_id in machines or line_id in lines
+            )
+            if chunk:
+                yield chunk
+    finally:
+        await subscription.close()
@@ -0,0 +1,87 @@
+import io
+
+import numpy as np
+import pandas as pd
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def to_columns(data):
+    """Normalise response data into a dict of equal-length NumPy arrays.
+
+    Views that know they are rendering columnar output pass arrays directly
+    (timestamps as int64 nanoseconds since the epoch, UTC); plain DRF data
+    (a list of row dicts, or one dict of scalars) is transposed here.
+    """
+    if isinstance(data, dict):
+        if all(isinstance(value, np.ndarray) for value in data.values()):
+            return data
+        data = [data]
+    if not data:
+        return {}
+    return {key: np.asarray([row.get(key) for row in data]) for key in data[0]}
+
+
+def rows_to_columns(rows, names):
+    """Transpose value tuples into typed columns for the columnar renderers."""
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    result = {}
+    for name, column in zip(names, columns):
+        if name == 'timestamp':
+            result[name] = pd.DatetimeIndex(column).as_unit('ns').asi8
+        else:
+            result[name] = np.asarray(column)
+    return result
+
+
+class NumpyColumnarRenderer(BaseRenderer):
+    """Uncompressed .npz archive with one array per column; read with np.load()."""
+    media_type = 'application/x-npz'
+    format = 'npz'
+    charset = None
+    render_style = 'binary'
+    columnar = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.BytesIO()
+        np.savez(buffer, **to_columns(data))
+        return buffer.getvalue()
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    """Apache Arrow IPC stream; 'timestamp' columns become timestamp[ns, UTC]."""
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+    columnar = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        arrays = {}
+        for name, column in to_columns(data).items():
+            if name == 'timestamp' and column.dtype == np.int64:
+                arrays[name] = pa.array(column.view('datetime64[ns]'), type=pa.timestamp('ns', tz='UTC'))
+            else:
+                arrays[name] = pa.array(column)
+        table = pa.table(arrays)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+COLUMNAR_RENDERERS = [NumpyColumnarRenderer] + ([ArrowStreamRenderer] if pa is not None else [])
+TIMESERIES_RENDERERS = list(api_settings.DEFAULT_RENDERER_CLASSES) + COLUMNAR_RENDERERS
+
+
+def wants_columnar(request):
+    return getattr(getattr(request, 'accepted_renderer', None), 'columnar', False)
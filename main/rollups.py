@@ -0,0 +1,190 @@
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .archive import retention_cutoff
+from .dbutils import bulk_upsert
+from .models import DaqLog, DaqLogRollup, DaqLogRollupState
+
+# Ordered finest to coarsest; each level is built from the one before it.
+RESOLUTIONS = {
+    '1m': 60,
+    '15m': 15 * 60,
+    '1h': 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+ROLLUP_FIELDS = ['min_value', 'max_value', 'avg_value', 'sum_value', 'count', 'first_value', 'last_value']
+
+
+def pick_resolution(start_date, end_date, max_points=None):
+    if max_points is None:
+        max_points = getattr(settings, 'DAQLOG_ROLLUP_MAX_POINTS', 2000)
+    span = (end_date - start_date).total_seconds()
+    for resolution, seconds in RESOLUTIONS.items():
+        if span / seconds <= max_points:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+
+def query_rollups(tag_id, start_date, end_date, resolution):
+    return DaqLogRollup.objects.filter(
+        tag_id=tag_id,
+        resolution=resolution,
+        bucket__gte=floor_datetime(start_date, RESOLUTIONS[resolution]),
+        bucket__lte=end_date,
+    ).order_by('bucket')
+
+
+def query_rollups_for_tags(tag_ids, start_date, end_date, resolution):
+    return DaqLogRollup.objects.filter(
+        tag_id__in=tag_ids,
+        resolution=resolution,
+        bucket__gte=floor_datetime(start_date, RESOLUTIONS[resolution]),
+        bucket__lte=end_date,
+    ).order_by('tag_id', 'bucket')
+
+
+def floor_datetime(value, seconds):
+    return pd.Timestamp(value).floor(f'{seconds}s').to_pydatetime()
+
+
+def _dirty_buckets(frame, seconds):
+    """Distinct (tag_id, bucket) pairs touched by a batch, from the retention cutoff on.
+
+    Buckets before the cutoff are skipped: their raw rows may already have
+    been moved to the archive, and recomputing them would overwrite complete
+    rollups with partial ones.
+    """
+    buckets = frame.assign(bucket=frame['timestamp'].dt.floor(f'{seconds}s'))[['tag_id', 'bucket']]
+    buckets = buckets[buckets['bucket'] >= pd.Timestamp(retention_cutoff())]
+    return buckets.drop_duplicates().sort_values(['tag_id', 'bucket'])
+
+
+def _bucket_runs(buckets, seconds):
+    # Adjacent buckets of a tag are merged into one range to keep the query short.
+    step = pd.Timedelta(seconds=seconds)
+    run = (buckets['tag_id'].ne(buckets['tag_id'].shift()) | buckets['bucket'].diff().ne(step)).cumsum()
+    runs = buckets.groupby(run).agg(tag_id=('tag_id', 'first'), lo=('bucket', 'min'), hi=('bucket', 'max'))
+    for row in runs.itertuples(index=False):
+        yield row.tag_id, row.lo.to_pydatetime(), (row.hi + step).to_pydatetime()
+
+
+def _read(queryset, buckets, seconds, field, columns):
+    # Scattered buckets can make thousands of ranges; a single OR over all of
+    # them overflows the expression depth limits of some databases.
+    runs = list(_bucket_runs(buckets, seconds))
+    size = getattr(settings, 'DAQLOG_ROLLUP_RANGES_PER_QUERY', 200)
+    rows = []
+    for offset in range(0, len(runs), size):
+        rows += queryset.filter(reduce(or_, (
+            Q(tag_id=tag_id, **{f'{field}__gte': lo, f'{field}__lt': hi})
+            for tag_id, lo, hi in runs[offset:offset + size]
+        ))).values_list('tag_id', field, *columns)
+    return pd.DataFrame.from_records(rows, columns=['tag_id', 'timestamp'] + columns)
+
+
+def _save(frame, resolution):
+    rollups = [
+        DaqLogRollup(
+            tag_id=row.tag_id,
+            resolution=resolution,
+            bucket=row.bucket.to_pydatetime(),
+            min_value=row.min_value,
+            max_value=row.max_value,
+            avg_value=row.sum_value / row.count,
+            sum_value=row.sum_value,
+            count=row.count,
+            first_value=row.first_value,
+            last_value=row.last_value,
+        )
+        for row in frame.itertuples(index=False)
+    ]
+    bulk_upsert(DaqLogRollup, rollups, ['tag', 'resolution', 'bucket'], ROLLUP_FIELDS + ['modified'])
+
+
+def _rollup_raw(buckets, seconds, last_log_id):
+    # Rows above the new watermark (inserted while this runs) are left out, so
+    # a rollup holds exactly the rows with id <= last_log_id of its buckets.
+    frame = _read(DaqLog.objects.filter(id__lte=last_log_id), buckets, seconds, 'timestamp', ['value'])
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True)
+    frame = frame.sort_values(['tag_id', 'timestamp'])
+    frame['bucket'] = frame['timestamp'].dt.floor(f'{seconds}s')
+    return frame.groupby(['tag_id', 'bucket'], sort=False)['value'].agg(
+        min_value='min', max_value='max', sum_value='sum', count='count', first_value='first', last_value='last',
+    ).reset_index()
+
+
+def _rollup_finer(buckets, seconds, finer):
+    frame = _read(DaqLogRollup.objects.filter(resolution=finer), buckets, seconds, 'bucket', ROLLUP_FIELDS)
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True)
+    frame = frame.sort_values(['tag_id', 'timestamp'])
+    frame['bucket'] = frame['timestamp'].dt.floor(f'{seconds}s')
+    return frame.groupby(['tag_id', 'bucket'], sort=False).agg(
+        min_value=('min_value', 'min'),
+        max_value=('max_value', 'max'),
+        sum_value=('sum_value', 'sum'),
+        count=('count', 'sum'),
+        first_value=('first_value', 'first'),
+        last_value=('last_value', 'last'),
+    ).reset_index()
+
+
+def refresh_rollups(batch_size=50000):
+    """Fold DaqLog rows written since the last run into every rollup level.
+
+    Each batch of new rows marks the buckets its readings fall in as dirty;
+    only those are recomputed, from raw rows for 1m and from the next finer
+    level above that, so late or corrected readings are picked up too.
+    Buckets older than the DaqLog retention cutoff are left alone.
+
+    Concurrent inserters commit auto-increment ids out of order, so a row
+    below an id already seen can still appear. Only rows whose modified stamp
+    is DAQLOG_ROLLUP_SETTLE_SECONDS old are folded in, stopping at the first
+    newer one; the watermark therefore never passes a row from a transaction
+    that began less than that long ago. Inserting transactions must commit
+    within the settle time.
+    """
+    state, _ = DaqLogRollupState.objects.get_or_create(id=1)
+    settled_before = timezone.now() - timedelta(seconds=getattr(settings, 'DAQLOG_ROLLUP_SETTLE_SECONDS', 300))
+    processed = 0
+
+    while True:
+        new_rows = list(
+            DaqLog.objects.filter(id__gt=state.last_log_id).order_by('id')
+            .values_list('id', 'tag_id', 'timestamp', 'modified')[:batch_size]
+        )
+        frame = pd.DataFrame.from_records(new_rows, columns=['id', 'tag_id', 'timestamp', 'modified'])
+        settled = frame[(pd.to_datetime(frame['modified'], utc=True) < settled_before).cummin()]
+        if settled.empty:
+            break
+
+        frame = settled.assign(timestamp=pd.to_datetime(settled['timestamp'], utc=True))
+
+        last_log_id = int(frame['id'].max())
+        with transaction.atomic():
+            finer = None
+            for resolution, seconds in RESOLUTIONS.items():
+                buckets = _dirty_buckets(frame, seconds)
+                if not buckets.empty:
+                    if finer is None:
+                        rollup = _rollup_raw(buckets, seconds, last_log_id)
+                    else:
+                        rollup = _rollup_finer(buckets, seconds, finer)
+                    _save(rollup, resolution)
+                finer = resolution
+
+            state.last_log_id = last_log_id
+            state.save()
+
+        processed += len(frame)
+        if len(frame) < len(new_rows):
+            break
+
+    return processed
@@ -1,8 +1,12 @@
+from operator import attrgetter
+
+from django.db.models import QuerySet
+from django.utils import timezone
 from rest_framework import serializers
 from .models import (
     AuthRole, AuthUser, Plant, Block, Line, Machine, 
     SensorTagType, SensorTag, DaqLog, Alert, Incident, 
-    IncidentTransaction
+    IncidentTransaction, DaqLogRollup
 )
 
 class AuthRoleSerializer(serializers.ModelSerializer):
@@ -40,6 +44,13 @@ class MachineSerializer(serializers.ModelSerializer):
         model = Machine
         fields = '__all__'
 
+class MachineDetailSerializer(MachineSerializer):
+    # The parent line is serialized once per line and shared via context.
+    line = serializers.SerializerMethodField()
+
+    def get_line(self, obj):
+        return self.context['lines'][obj.line_id]
+
 class SensorTagTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = SensorTagType
@@ -55,6 +66,11 @@ class DaqLogSerializer(serializers.ModelSerializer):
         model = DaqLog
         fields = '__all__'
 
+class DaqLogRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DaqLogRollup
+        fields = '__all__'
+
 class AlertSerializer(serializers.ModelSerializer):
     class Meta:
         model = Alert
@@ -74,4 +90,83 @@ class IncidentTransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = IncidentTransaction
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+def format_datetime(value, tz=None):
+    # Matches DRF's DateTimeField output (current timezone, 'Z' for UTC).
+    # Looking up the current timezone is the slow part, so callers
+    # formatting many values pass it in.
+    if value.utcoffset() is not None:
+        value = value.astimezone(tz or timezone.get_current_timezone())
+    text = value.isoformat()
+    if text.endswith('+00:00'):
+        text = text[:-6] + 'Z'
+    return text
+
+def format_time(value, tz=None):
+    return value.isoformat()
+
+class FastReadSerializer:
+    """Read-only list serializer over values_list() tuples.
+
+    Subclasses declare (field, column, converter) triples; a row becomes
+    dict(zip(names, row)) with only the converted fields rewritten, instead of
+    DRF's per-field to_representation calls. Output matches the
+    ModelSerializer it stands in for.
+    """
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        names = tuple(field for field, _, _ in cls.fields)
+        converters = tuple(
+            (field, index, converter) for index, (field, _, converter) in enumerate(cls.fields) if converter is not None
+        )
+
+        def to_dict(row, tz):
+            result = dict(zip(names, row))
+            for field, index, converter in converters:
+                result[field] = converter(row[index], tz)
+            return result
+
+        cls.to_dict = staticmethod(to_dict)
+        cls.columns = tuple(column for _, column, _ in cls.fields)
+        cls.attributes = attrgetter(*cls.columns)
+
+    def __init__(self, instance=None, many=False):
+        self.instance = instance
+        self.many = many
+
+    @property
+    def data(self):
+        to_dict = self.to_dict
+        tz = timezone.get_current_timezone()
+        if not self.many:
+            return to_dict(self.attributes(self.instance), tz)
+        if isinstance(self.instance, QuerySet):
+            return [to_dict(row, tz) for row in self.instance.values_list(*self.columns)]
+        attributes = self.attributes
+        return [to_dict(attributes(obj), tz) for obj in self.instance]
+
+class DaqLogFastSerializer(FastReadSerializer):
+    fields = (
+        ('id', 'id', None),
+        ('timestamp', 'timestamp', format_datetime),
+        ('value', 'value', None),
+        ('inactive', 'inactive', None),
+        ('modified', 'modified', format_datetime),
+        ('tag', 'tag_id', None),
+    )
+
+class AlertFastSerializer(FastReadSerializer):
+    fields = (
+        ('id', 'id', None),
+        ('timestamp', 'timestamp', format_time),
+        ('name', 'name', None),
+        ('type', 'type', None),
+        ('inactive', 'inactive', None),
+        ('modified', 'modified', format_datetime),
+        ('line', 'line_id', None),
+        ('tag', 'tag_id', None),
+    )
\ No newline at end of file
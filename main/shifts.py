@@ -0,0 +1,222 @@
+import logging
+import zoneinfo
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from . import topology
+from .models import Line, Shift, ShiftCalendar, validate_weekdays
+
+logger = logging.getLogger(__name__)
+
+# Shift boundaries of every calendar are expanded into a sorted, non-
+# overlapping pd.IntervalIndex (UTC, closed on the left) covering
+# SHIFT_INDEX_PAST_DAYS before today to SHIFT_INDEX_FUTURE_DAYS after it, so
+# resolving a shift= or day= selector is a binary search. Days outside that
+# span are expanded on demand. Every resolved window starts and ends on shift
+# boundaries, which keeps metric cache keys identical across clients.
+
+
+def localize(wall_times, tz):
+    """Local wall times to aware stamps; times in a DST gap move forward and
+    repeated times take their first (summer time) occurrence."""
+    return wall_times.tz_localize(tz, ambiguous=np.ones(len(wall_times), dtype=bool), nonexistent='shift_forward')
+
+
+def _load_calendars():
+    calendars = {}
+    for calendar_id, tz_name in ShiftCalendar.objects.filter(inactive=False).values_list('id', 'timezone'):
+        try:
+            tz = zoneinfo.ZoneInfo(tz_name) if tz_name else timezone.get_default_timezone()
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            # Rows written around model validation (here and for weekdays
+            # below); their lines fall back to the plant calendar or to
+            # fixed-length shifts.
+            logger.warning("Skipping shift calendar %s: unknown time zone %r", calendar_id, tz_name)
+            continue
+        calendars[calendar_id] = {'tz': tz, 'shifts': [], 'index': None}
+
+    shifts = Shift.objects.filter(inactive=False, calendar__inactive=False).order_by('start_time', 'id')
+    for calendar_id, name, start_time, end_time, weekdays in shifts.values_list(
+        'calendar_id', 'name', 'start_time', 'end_time', 'weekdays'
+    ):
+        if calendar_id not in calendars:
+            continue
+        try:
+            validate_weekdays(weekdays)
+        except ValidationError:
+            logger.warning("Skipping shift calendar %s: shift %s has weekdays %r", calendar_id, name, weekdays)
+            del calendars[calendar_id]
+            continue
+        calendars[calendar_id]['shifts'].append((name, start_time, end_time, weekdays))
+
+    by_block, by_plant = {}, {}
+    for calendar_id, plant_id, block_id in ShiftCalendar.objects.filter(inactive=False).order_by('id').values_list(
+        'id', 'plant_id', 'block_id'
+    ):
+        if calendar_id not in calendars:
+            continue
+        if block_id is None:
+            by_plant.setdefault(plant_id, calendar_id)
+        else:
+            by_block.setdefault(block_id, calendar_id)
+
+    lines = {}
+    for line_id, block_id, plant_id in Line.objects.values_list('id', 'block_id', 'block__plant_id'):
+        calendar_id = by_block.get(block_id, by_plant.get(plant_id))
+        if calendar_id is not None:
+            lines[line_id] = calendar_id
+    return {'calendars': calendars, 'lines': lines}
+
+
+def calendar_for_line(line_id):
+    """The line's shift calendar, or None when its block and plant have none."""
+    loaded = topology.versioned('shift_calendars', _load_calendars)
+    calendar_id = loaded['lines'].get(line_id)
+    return loaded['calendars'][calendar_id] if calendar_id is not None else None
+
+
+def _build_index(calendar, first_day, last_day):
+    days = pd.date_range(first_day, last_day, freq='D')
+    starts, ends, names, shift_days = [], [], [], []
+    for name, start_time, end_time, weekdays in calendar['shifts']:
+        active = days[np.isin(days.weekday, [int(day) for day in weekdays])]
+        start = pd.Timedelta(hours=start_time.hour, minutes=start_time.minute, seconds=start_time.second)
+        end = pd.Timedelta(hours=end_time.hour, minutes=end_time.minute, seconds=end_time.second)
+        if end <= start:
+            end += pd.Timedelta(days=1)
+        starts.append(localize(active + start, calendar['tz']).as_unit('ns').asi8)
+        ends.append(localize(active + end, calendar['tz']).as_unit('ns').asi8)
+        shift_days.append(active.as_unit('ns').asi8)
+        names += [name] * len(active)
+
+    empty = [np.array([], dtype=np.int64)]
+    starts, ends = np.concatenate(starts or empty), np.concatenate(ends or empty)
+    order = np.argsort(starts, kind='stable')
+    return {
+        'first': first_day,
+        'last': last_day,
+        'intervals': pd.IntervalIndex.from_arrays(
+            pd.DatetimeIndex(starts[order]).tz_localize('UTC'), pd.DatetimeIndex(ends[order]).tz_localize('UTC'), closed='left'
+        ),
+        'names': np.array(names, dtype=object)[order],
+        'days': pd.DatetimeIndex(np.concatenate(shift_days or empty)[order]),
+    }
+
+
+def shift_index(calendar, first_day, last_day):
+    """Index of the calendar's shifts starting between first_day and last_day."""
+    index = calendar['index']
+    if index is not None and index['first'] <= first_day and last_day <= index['last']:
+        return index
+
+    today = timezone.now().astimezone(calendar['tz']).date()
+    span_first = today - timedelta(days=getattr(settings, 'SHIFT_INDEX_PAST_DAYS', 400))
+    span_last = today + timedelta(days=getattr(settings, 'SHIFT_INDEX_FUTURE_DAYS', 7))
+    if span_first <= first_day and last_day <= span_last:
+        calendar['index'] = _build_index(calendar, span_first, span_last)
+        return calendar['index']
+    return _build_index(calendar, first_day, last_day)
+
+
+def _window_index(calendar, start_date, end_date):
+    # A shift started the day before can still be running at start_date.
+    tz = calendar['tz']
+    return shift_index(calendar, start_date.astimezone(tz).date() - timedelta(days=1), end_date.astimezone(tz).date())
+
+
+def shifts_between(calendar, start_date, end_date):
+    """[(start, end, name, day)] of the shifts overlapping the window, clipped to it."""
+    index = _window_index(calendar, start_date, end_date)
+    intervals = index['intervals']
+    first = np.searchsorted(intervals.right, pd.Timestamp(start_date), side='right')
+    last = np.searchsorted(intervals.left, pd.Timestamp(end_date), side='left')
+    tz = calendar['tz']
+    return [
+        (
+            max(intervals.left[i], pd.Timestamp(start_date)).tz_convert(tz),
+            min(intervals.right[i], pd.Timestamp(end_date)).tz_convert(tz),
+            index['names'][i],
+            index['days'][i].date(),
+        )
+        for i in range(first, last)
+    ]
+
+
+def days_between(calendar, start_date, end_date):
+    """[(start, end, None, day)] of the production days overlapping the window.
+
+    A production day runs from the start of its first shift to the end of its
+    last one.
+    """
+    days = {}
+    for start, end, _, day in shifts_between(calendar, start_date, end_date):
+        first, last = days.get(day, (start, end))
+        days[day] = (min(first, start), max(last, end))
+    return [(start, end, None, day) for day, (start, end) in sorted(days.items())]
+
+
+def _day_window(calendar, day):
+    if calendar:
+        index = shift_index(calendar, day, day)
+        selected = index['days'] == pd.Timestamp(day)
+        if selected.any():
+            return index['intervals'].left[selected].min(), index['intervals'].right[selected].max()
+    tz = calendar['tz'] if calendar else timezone.get_current_timezone()
+    midnight = localize(pd.DatetimeIndex([day, day + timedelta(days=1)]), tz)
+    return midnight[0], midnight[1]
+
+
+def resolve_window(line_id, day=None, shift=None, now=None):
+    """(start, end) selected by day= and shift= for a line.
+
+    day is a date (YYYY-MM-DD); shift is the name of one of the line's shifts
+    on that day, or current/previous relative to now. Windows still open are
+    cut at now. Raises ValueError with a message for the client.
+    """
+    try:
+        calendar = calendar_for_line(int(line_id))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid line id.")
+    now = now or timezone.now()
+
+    if shift in ('current', 'previous'):
+        if calendar is None:
+            raise ValueError("The line has no shift calendar.")
+        index = _window_index(calendar, now - timedelta(days=1), now)
+        intervals = index['intervals']
+        position = np.searchsorted(intervals.left, pd.Timestamp(now), side='right') - 1
+        running = position >= 0 and pd.Timestamp(now) < intervals.right[position]
+        if shift == 'current' and not running:
+            raise ValueError("No shift is running.")
+        if shift == 'previous' and running:
+            position -= 1
+        if position < 0:
+            raise ValueError("No previous shift.")
+        start, end = intervals.left[position], intervals.right[position]
+    elif day:
+        try:
+            day = date.fromisoformat(day)
+        except ValueError:
+            raise ValueError("day must be a date (YYYY-MM-DD).")
+        if shift:
+            if calendar is None:
+                raise ValueError("The line has no shift calendar.")
+            index = shift_index(calendar, day, day)
+            selected = np.flatnonzero((index['days'] == pd.Timestamp(day)) & (index['names'] == shift))
+            if not len(selected):
+                raise ValueError(f"No shift {shift} on {day.isoformat()}.")
+            start, end = index['intervals'].left[selected[0]], index['intervals'].right[selected[0]]
+        else:
+            start, end = _day_window(calendar, day)
+    else:
+        raise ValueError("shift requires day, unless it is current or previous.")
+
+    start, end = start.to_pydatetime(), end.to_pydatetime()
+    if start >= now:
+        raise ValueError("The selected window has not started yet.")
+    return start, min(end, now)
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import topology
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_topology(sender, **kwargs):
+    if sender in topology.TOPOLOGY_MODELS:
+        topology.bump_version()
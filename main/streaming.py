@@ -0,0 +1,92 @@
+import csv
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .serializers import DaqLogFastSerializer
+
+FORMATS = ('json', 'ndjson', 'csv')
+
+DAQLOG_FIELDS = tuple(field for field, _, _ in DaqLogFastSerializer.fields)
+
+
+def chunk_size():
+    return getattr(settings, 'DAQLOG_STREAM_CHUNK_SIZE', 5000)
+
+
+def keyset_chunks(queryset, columns, size=None):
+    """Yield lists of value tuples ordered by (timestamp, id).
+
+    Each chunk is a separate LIMIT query seeking past the previous chunk's
+    last key, so neither the server nor the MySQL client ever buffers more
+    than one chunk, unlike .iterator() on mysqlclient.
+    """
+    size = size or chunk_size()
+    ts_index, id_index = columns.index('timestamp'), columns.index('id')
+    queryset = queryset.order_by('timestamp', 'id').values_list(*columns)
+    page = queryset
+
+    while True:
+        rows = list(page[:size])
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        last_ts, last_id = rows[-1][ts_index], rows[-1][id_index]
+        page = queryset.filter(Q(timestamp__gt=last_ts) | Q(timestamp=last_ts, id__gt=last_id))
+
+
+async def akeyset_chunks(queryset, columns, size=None):
+    """Async keyset_chunks() for the ASGI views."""
+    size = size or chunk_size()
+    ts_index, id_index = columns.index('timestamp'), columns.index('id')
+    queryset = queryset.order_by('timestamp', 'id').values_list(*columns)
+    page = queryset
+
+    while True:
+        rows = [row async for row in page[:size]]
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        last_ts, last_id = rows[-1][ts_index], rows[-1][id_index]
+        page = queryset.filter(Q(timestamp__gt=last_ts) | Q(timestamp=last_ts, id__gt=last_id))
+
+
+def _chunks(queryset, archived):
+    if archived is not None:
+        yield from archived
+    yield from keyset_chunks(queryset, DaqLogFastSerializer.columns)
+
+
+def _ndjson(queryset, archived):
+    to_dict = DaqLogFastSerializer.to_dict
+    tz = timezone.get_current_timezone()
+    for rows in _chunks(queryset, archived):
+        yield ''.join(json.dumps(to_dict(row, tz)) + '\n' for row in rows)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _csv(queryset, archived):
+    to_dict = DaqLogFastSerializer.to_dict
+    tz = timezone.get_current_timezone()
+    writer = csv.writer(_Echo())
+    yield writer.writerow(DAQLOG_FIELDS)
+    for rows in _chunks(queryset, archived):
+        yield ''.join(writer.writerow(to_dict(row, tz).values()) for row in rows)
+
+
+def stream_daqlogs(queryset, fmt, filename='daqlogs', archived=None):
+    """Stream the queryset, preceded by `archived`, chunks of row tuples (DaqLogFastSerializer.columns)."""
+    if fmt == 'csv':
+        response = StreamingHttpResponse(_csv(queryset, archived), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+    return StreamingHttpResponse(_ndjson(queryset, archived), content_type='application/x-ndjson')
@@ -1,3 +1,1182 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import queue
+import tempfile
+import time
+from pathlib import Path
+from concurrent.futures import Future
+from unittest import mock, skipUnless
+from datetime import datetime, timedelta
+from datetime import time as clock_time
+from datetime import timezone as dt_timezone
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import alerts, archive, backfill, buffer, latest, partitions, push, renderers, rollups
+from .ingest import write_daqlogs
+from .management.commands.backfill_daqlogs import Command as BackfillCommand
+from .metrics import line_metrics, line_metrics_series
+from .pagination import TimeSeriesCursorPagination
+from .models import (
+    Alert,
+    AuthRole,
+    AuthUser,
+    Block,
+    DaqLog,
+    DaqLogRollup,
+    DaqLogRollupState,
+    Incident,
+    IncidentTransaction,
+    Line,
+    Machine,
+    Plant,
+    SensorTag,
+    SensorTagLatest,
+    SensorTagType,
+    Shift,
+    ShiftCalendar,
+)
+from .rollups import refresh_rollups
+from .serializers import AlertFastSerializer, AlertSerializer, DaqLogFastSerializer, DaqLogSerializer, format_datetime
+from .shifts import resolve_window
+from .streaming import akeyset_chunks, keyset_chunks
+
+
+async def read_stream(response):
+    return b''.join([chunk async for chunk in response.streaming_content])
+
+
+def create_line(block, tag_type, name, tags=(('Production', SensorTag.PRODUCTION), ('Downtime', SensorTag.DOWNTIME))):
+    line = Line.objects.create(block=block, name=name, status='active', target_production=100)
+    machine = Machine.objects.create(
+        line=line, name=f'{name} Press', status='running',
+        height_px=10, width_px=10, x_coordinate=0, y_coordinate=0,
+    )
+    tags = [
+        SensorTag.objects.create(
+            machine=machine, tag_type=tag_type, name=tag_name,
+            min_val=0, max_val=1000, threshold_alert='warning',
+            metric_role=metric_role,
+        )
+        for tag_name, metric_role in tags
+    ]
+    return line, tags
+
+
+class MachinePerformanceViewTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        self.block = Block.objects.create(plant=plant, name='Block')
+        self.tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.now = timezone.now()
+        self.params = {
+            'StartDate': (self.now - timedelta(hours=1)).isoformat(),
+            'EndDate': (self.now + timedelta(hours=1)).isoformat(),
+        }
+
+    def add_lines(self, count):
+        for _ in range(count):
+            _, tags = create_line(self.block, self.tag_type, f'Line {Line.objects.count() + 1}')
+            DaqLog.objects.bulk_create([
+                DaqLog(tag=tag, timestamp=self.now, value=value)
+                for tag in tags
+                for value in (10, 5)
+            ])
+
+    def test_totals_per_line(self):
+        self.add_lines(2)
+        idle_line, _ = create_line(self.block, self.tag_type, 'Idle')
+
+        response = self.client.get('/api/machine-performance/', self.params)
+
+        self.assertEqual(response.status_code, 200)
+        data = {row['line_id']: row for row in response.json()}
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[idle_line.id]['production'], 0)
+        for row in data.values():
+            if row['line_id'] != idle_line.id:
+                self.assertEqual(row['production'], 15)
+                self.assertEqual(row['downtime'], 15)
+
+    def test_query_count_is_constant(self):
+        self.add_lines(1)
+        with self.assertNumQueries(2):
+            self.client.get('/api/machine-performance/', self.params)
+
+        self.add_lines(25)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/machine-performance/', self.params)
+        self.assertEqual(len(response.json()), 26)
+
+
+class ProductionLineDetailViewTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        self.block = Block.objects.create(plant=plant, name='Block')
+        self.tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+
+    def test_nested_topology(self):
+        line, tags = create_line(self.block, self.tag_type, 'Line 1')
+
+        response = self.client.get('/api/production-line-details/')
+
+        self.assertEqual(response.status_code, 200)
+        [line_data] = response.json()
+        [machine_data] = line_data['machines']
+        self.assertEqual(line_data['id'], line.id)
+        self.assertEqual(machine_data['line']['id'], line.id)
+        self.assertNotIn('machines', machine_data['line'])
+        self.assertEqual([tag['id'] for tag in machine_data['tags']], [tag.id for tag in tags])
+
+    def test_query_count_is_constant(self):
+        # The topology version, then lines, machines and tags.
+        create_line(self.block, self.tag_type, 'Line 1')
+        with self.assertNumQueries(4):
+            self.client.get('/api/production-line-details/')
+
+        for i in range(20):
+            create_line(self.block, self.tag_type, f'Line {i + 2}')
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/production-line-details/')
+        self.assertEqual(len(response.json()), 21)
+
+    def test_etag_revalidation(self):
+        line, _ = create_line(self.block, self.tag_type, 'Line 1')
+        etag = self.client.get('/api/production-line-details/')['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/production-line-details/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        line.name = 'Renamed'
+        line.save()
+        response = self.client.get('/api/production-line-details/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Renamed')
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(TOPOLOGY_VERSION_TTL=0)
+    def test_writes_by_other_workers_change_the_version(self):
+        # bulk_create() and update() send no signals, like a save in another process.
+        line, tags = create_line(self.block, self.tag_type, 'Line 1')
+        etag = self.client.get('/api/production-line-details/')['ETag']
+        post = lambda tag: self.client.post('/api/daqlogs/batch/', {
+            'tag_ids': [tag.id], 'timestamps': [timezone.now().isoformat()], 'values': [1.0],
+        }, content_type='application/json')
+        self.assertEqual(post(tags[0]).json()['inserted'], 1)
+
+        [tag] = SensorTag.objects.bulk_create([
+            SensorTag(machine=tags[0].machine, tag_type=self.tag_type, name='New', min_val=0, max_val=1000),
+        ])
+        self.assertEqual(post(tag).json()['inserted'], 1)
+
+        Line.objects.filter(id=line.id).update(name='Renamed', modified=timezone.now())
+        response = self.client.get('/api/production-line-details/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Renamed')
+
+
+class FastSerializerTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.line, self.tags = create_line(block, tag_type, 'Line 1')
+        now = timezone.now()
+        DaqLog.objects.bulk_create([
+            DaqLog(tag=self.tags[i % 2], timestamp=now - timedelta(seconds=i), value=i / 3)
+            for i in range(5000)
+        ])
+
+    def test_daqlog_output_matches(self):
+        queryset = DaqLog.objects.order_by('id')
+        self.assertEqual(
+            DaqLogFastSerializer(queryset, many=True).data,
+            DaqLogSerializer(queryset, many=True).data,
+        )
+        self.assertEqual(
+            DaqLogFastSerializer(list(queryset[:10]), many=True).data,
+            DaqLogSerializer(queryset[:10], many=True).data,
+        )
+
+    def test_alert_output_matches(self):
+        Alert.objects.create(line=self.line, tag=self.tags[0], timestamp=clock_time(14, 30), name='Overheat')
+        alert = Alert.objects.get()
+        self.assertEqual(AlertFastSerializer(alert).data, AlertSerializer(alert).data)
+
+    @skipUnless(os.environ.get('RUN_BENCHMARKS'), "wall-clock benchmark; set RUN_BENCHMARKS=1")
+    def test_daqlog_throughput(self):
+        started = time.perf_counter()
+        DaqLogSerializer(DaqLog.objects.all(), many=True).data
+        model_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        DaqLogFastSerializer(DaqLog.objects.all(), many=True).data
+        fast_seconds = time.perf_counter() - started
+
+        self.assertLess(fast_seconds, model_seconds)
+
+
+@override_settings(ALERT_HYSTERESIS=0.02, ALERT_COOLDOWN_SECONDS=300)
+class DaqLogViewTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.line, tags = create_line(block, tag_type, 'Line 1')
+        self.tag = tags[0]
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=2)
+        self.values = [float(i % 10) for i in range(100)]
+        self.values[37], self.values[62] = -50.0, 500.0
+        self.stamps = [self.start + timedelta(minutes=i) for i in range(100)]
+        write_daqlogs([self.tag.id] * 100, self.stamps, self.values, live=False)
+        self.params = {
+            'LineId': self.line.id, 'MachineId': self.tag.machine_id, 'TagId': self.tag.id,
+            'StartDate': self.start.isoformat(), 'EndDate': (self.start + timedelta(hours=2)).isoformat(),
+        }
+
+    def get(self, path='/api/daqlogs/', accept='*/*', **params):
+        return self.client.get(path, {**self.params, **params}, HTTP_ACCEPT=accept)
+
+    def test_downsampling_methods(self):
+        points = self.get(MaxPoints=10).json()
+        self.assertEqual(len(points), 10)
+        self.assertEqual((points[0]['value'], points[-1]['value']), (self.values[0], self.values[-1]))
+        self.assertIn(500.0, [point['value'] for point in points])
+        self.assertEqual(points, sorted(points, key=lambda point: point['timestamp']))
+
+        points = self.get(MaxPoints=10, Method='minmax').json()
+        self.assertLessEqual(len(points), 10)
+        self.assertTrue({-50.0, 500.0} <= {point['value'] for point in points})
+        # One bucket for an odd MaxPoints of 3: its minimum and maximum only.
+        self.assertEqual([point['value'] for point in self.get(MaxPoints=3, Method='minmax').json()], [-50.0, 500.0])
+
+        points = self.get(MaxPoints=10, Method='avg').json()
+        self.assertEqual(len(points), 10)
+        self.assertAlmostEqual(points[3]['value'], np.mean(self.values[30:40]))
+
+        self.assertEqual(len(self.get(MaxPoints=100).json()), 100)
+
+    def test_downsampling_bounds(self):
+        for params in ({'MaxPoints': 2}, {'MaxPoints': 'ten'}, {'MaxPoints': 10, 'Method': 'median'}):
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+
+    @override_settings(DAQLOG_STREAM_CHUNK_SIZE=7)
+    def test_streams_cross_chunk_boundaries_once(self):
+        # Ten readings share a timestamp, so a chunk boundary falls among ties.
+        write_daqlogs([self.tag.id] * 10, [self.stamps[50]] * 10, [7.0] * 10, live=False)
+        expected = list(DaqLog.objects.order_by('timestamp', 'id').values_list('id', flat=True))
+
+        chunks = list(keyset_chunks(DaqLog.objects.all(), ('id', 'timestamp')))
+        self.assertEqual([len(chunk) for chunk in chunks], [7] * 15 + [5])
+        self.assertEqual([log_id for chunk in chunks for log_id, _ in chunk], expected)
+
+        async def collect():
+            return [chunk async for chunk in akeyset_chunks(DaqLog.objects.all(), ('id', 'timestamp'))]
+        self.assertEqual(async_to_sync(collect)(), chunks)
+
+        response = self.get(Format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], expected)
+        self.assertEqual(rows, self.get().json())
+
+        response = self.get(Format='csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), list(rows[0]))
+        self.assertEqual([int(line.split(',')[0]) for line in lines[1:]], expected)
+
+
+    def test_npz_round_trip(self):
+        expected = list(DaqLog.objects.order_by('timestamp', 'id').values_list('id', 'timestamp', 'value'))
+        response = self.get(accept='application/x-npz')
+        self.assertEqual(response['Content-Type'], 'application/x-npz')
+        with np.load(io.BytesIO(response.content)) as columns:
+            self.assertEqual(columns['id'].tolist(), [row[0] for row in expected])
+            self.assertEqual(pd.to_datetime(columns['timestamp'], utc=True).tolist(), [row[1] for row in expected])
+            self.assertEqual(columns['value'].tolist(), self.values)
+
+        with np.load(io.BytesIO(self.get(format='npz', MaxPoints=3, Method='minmax').content)) as columns:
+            self.assertEqual(sorted(columns), ['timestamp', 'value'])
+            self.assertEqual(columns['value'].tolist(), [-50.0, 500.0])
+
+        # Row dicts from views that do not build columns are transposed.
+        response = self.client.get('/api/machine-performance/', {
+            'StartDate': self.start.isoformat(), 'EndDate': timezone.now().isoformat(), 'format': 'npz',
+        })
+        with np.load(io.BytesIO(response.content)) as columns:
+            self.assertEqual(columns['line_id'].tolist(), [self.line.id])
+            self.assertEqual(columns['production'].tolist(), [sum(self.values)])
+
+    @skipUnless(renderers.pa, 'pyarrow is not installed')
+    def test_arrow_round_trip(self):
+        response = self.get(accept='application/vnd.apache.arrow.stream')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        table = renderers.pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(str(table.schema.field('timestamp').type), 'timestamp[ns, tz=UTC]')
+        self.assertEqual(table.column('timestamp').to_pylist(), self.stamps)
+        self.assertEqual(table.column('value').to_pylist(), self.values)
+        self.assertEqual(table.column('id').to_pylist(),
+                         list(DaqLog.objects.order_by('timestamp', 'id').values_list('id', flat=True)))
+
+
+@override_settings(DAQLOG_ROLLUP_SETTLE_SECONDS=0)
+class DaqLogQueryViewTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.line, self.tags = create_line(block, tag_type, 'Line 1')
+        _, self.other_tags = create_line(block, tag_type, 'Line 2')
+        self.start = timezone.now().replace(second=0, microsecond=0) - timedelta(hours=2)
+        for offset, tag in enumerate(self.tags + self.other_tags):
+            stamps = [self.start + timedelta(seconds=20 * i + offset) for i in range(30)]
+            write_daqlogs([tag.id] * 30, stamps, [float(i + 10 * offset) for i in range(30)], live=False)
+        self.window = {'StartDate': self.start.isoformat(), 'EndDate': (self.start + timedelta(hours=1)).isoformat()}
+
+    def query(self, **params):
+        return self.client.get('/api/daqlogs/query/', {**self.window, **params})
+
+    def test_series_are_grouped_by_tag(self):
+        first, second = self.tags[0], self.other_tags[0]
+        response = self.query(TagIds=f'{second.id},{first.id},{second.id}')
+        self.assertEqual(response.status_code, 200)
+        series = response.json()
+        self.assertEqual([entry['tag'] for entry in series], [second.id, first.id])
+        for entry, tag in zip(series, (second, first)):
+            single = self.client.get('/api/daqlogs/', {
+                'LineId': tag.machine.line_id, 'MachineId': tag.machine_id, 'TagId': tag.id, **self.window,
+            }).json()
+            self.assertEqual(entry['points'], [{'timestamp': row['timestamp'], 'value': row['value']} for row in single])
+
+        self.assertEqual([entry['tag'] for entry in self.query(LineId=self.line.id).json()],
+                         [tag.id for tag in self.tags])
+        self.assertEqual([entry['tag'] for entry in self.query(MachineId=second.machine_id).json()],
+                         [tag.id for tag in self.other_tags])
+
+        # One range query however many tags are asked for.
+        all_tags = ','.join(str(tag.id) for tag in self.tags + self.other_tags)
+        with self.assertNumQueries(2):
+            self.query(TagIds=str(first.id))
+        with self.assertNumQueries(2):
+            self.query(TagIds=all_tags)
+
+    def test_downsampling_and_rollups_apply_per_tag(self):
+        series = self.query(LineId=self.line.id, MaxPoints=5).json()
+        self.assertEqual([len(entry['points']) for entry in series], [5, 5])
+
+        refresh_rollups()
+        series = self.query(LineId=self.line.id, Resolution='1m').json()
+        points = series[1]['points']
+        self.assertEqual(len(points), 10)
+        self.assertEqual((points[0]['min'], points[0]['max'], points[0]['value']), (10.0, 12.0, 11.0))
+
+    def test_invalid_queries(self):
+        for params in ({}, {'TagIds': 'a,b'}, {'LineId': self.line.id, 'Resolution': '5m'},
+                       {'LineId': self.line.id, 'MaxPoints': 2}):
+            response = self.query(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+        with override_settings(DAQLOG_QUERY_MAX_TAGS=1):
+            self.assertEqual(self.query(LineId=self.line.id).status_code, 400)
+
+
+class ControlPanelDataViewTests(TestCase):
+    PAYLOAD = {'Vry': 230, 'Vyb': 231, 'Vbr': 229, 'Cr': 5, 'Cy': 5, 'Cb': 5, 'Freq': 50, 'Temp': 40}
+
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        self.block = Block.objects.create(plant=plant, name='Block')
+        self.tag_type = SensorTagType.objects.create(name='Electrical', units='V')
+        _, self.tags = create_line(self.block, self.tag_type, 'Line 1', tags=[
+            ('Voltage Phase R-Y', None), ('Frequency', None), ('Temperature', None), ('Vibration', None),
+        ])
+
+    def post(self, payload=PAYLOAD):
+        return self.client.post('/api/control-panel-data/', payload, content_type='application/json')
+
+    def test_mapped_readings_are_clamped_and_the_rest_simulated(self):
+        self.assertEqual(self.post({**self.PAYLOAD, 'Freq': 5000}).status_code, 201)
+        values = dict(DaqLog.objects.values_list('tag__name', 'value'))
+        self.assertEqual((values['Voltage Phase R-Y'], values['Frequency'], values['Temperature']), (230, 1000, 40))
+        self.assertTrue(0 <= values['Vibration'] <= 1000)
+
+        self.assertEqual(self.post({'Vry': 'high'}).status_code, 400)
+
+    @override_settings(TOPOLOGY_VERSION_TTL=60)
+    def test_query_count_is_constant(self):
+        # The tag map is cached after the first post; then the DaqLog insert
+        # (in a savepoint here) and the latest-value upsert are all that run.
+        self.post()
+        with self.assertNumQueries(4):
+            self.post()
+
+        for number in range(2, 12):
+            create_line(self.block, self.tag_type, f'Line {number}', tags=[('Temperature', None), ('Vibration', None)])
+        self.post()
+        with self.assertNumQueries(4):
+            self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(DaqLog.objects.count(), 2 * 4 + 2 * 24)
+
+
+class AlertEngineTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Temperature', units='C')
+        self.line, self.tags = create_line(block, tag_type, 'Line 1', tags=[('Temperature', None)] * 10)
+        self.tag = self.tags[0]
+        self.start = timezone.now()
+        # Tag ids can be reused between tests, so start from a clean state.
+        alerts._state['ids'] = None
+
+    def write(self, values, offset=0):
+        stamps = [self.start + timedelta(seconds=offset + i) for i in range(len(values))]
+        write_daqlogs([self.tag.id] * len(values), stamps, values)
+
+    def test_flapping_signal_raises_once(self):
+        # max_val is 1000 and the band is 20, so nothing below 980 clears.
+        self.write([500, 1001, 995, 1002, 990, 1005, 999])
+        self.assertEqual(list(Alert.objects.values_list('name', 'type', 'tag_id')),
+                         [('High Temperature', 'warning', self.tag.id)])
+
+        # Cleared and raised again inside the cooldown: still one row.
+        self.write([900, 1010], offset=60)
+        self.assertEqual(Alert.objects.count(), 1)
+
+        self.write([900, 1010], offset=600)
+        self.write([-5], offset=700)
+        self.assertEqual(list(Alert.objects.order_by('id').values_list('name', flat=True)),
+                         ['High Temperature', 'High Temperature', 'Low Temperature'])
+
+    def test_alerts_have_ids_without_bulk_insert_returning(self):
+        stamps = pd.DatetimeIndex([self.start, self.start]).tz_convert('UTC')
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            raised = alerts.evaluate_readings([self.tags[0].id, self.tags[1].id], stamps, [1001, -5])
+        self.assertEqual(sorted(alert.id for alert in raised), sorted(Alert.objects.values_list('id', flat=True)))
+        self.assertEqual(len(raised), 2)
+
+    @skipUnless(os.environ.get('RUN_BENCHMARKS'), "wall-clock benchmark; set RUN_BENCHMARKS=1")
+    def test_batch_evaluation_time(self):
+        tag_ids = np.array([tag.id for tag in self.tags] * 100)
+        values = np.random.uniform(0, 900, len(tag_ids))
+        timings = []
+        for batch in range(20):
+            stamps = pd.DatetimeIndex([self.start + timedelta(seconds=batch)] * len(tag_ids))
+            started = time.perf_counter()
+            alerts.evaluate_readings(tag_ids, stamps, values)
+            timings.append(time.perf_counter() - started)
+
+        median = sorted(timings)[len(timings) // 2]
+        self.assertLess(median, 0.001)
+
+
+@override_settings(DAQLOG_ROLLUP_SETTLE_SECONDS=0)
+class MetricsSeriesTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.line, self.tags = create_line(block, tag_type, 'Line 1', tags=[
+            ('Production', SensorTag.PRODUCTION),
+            ('Downtime', SensorTag.DOWNTIME),
+            ('Quality', SensorTag.QUALITY),
+        ])
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=2)
+        self.write(0)
+
+    def write(self, seed):
+        rng = np.random.default_rng(seed)
+        offsets = rng.uniform(0, 2 * 86400, 3000)
+        tag_ids = [self.tags[i].id for i in rng.integers(0, 3, len(offsets))]
+        stamps = [self.start + timedelta(seconds=offset) for offset in offsets]
+        write_daqlogs(tag_ids, stamps, rng.uniform(0, 1, len(offsets)), live=False)
+
+    def assertMatchesWindows(self, start, end):
+        for interval in ('hour', 'shift', 'day'):
+            series = line_metrics_series(self.line, start, end, interval)
+            self.assertEqual(series['buckets'][0]['start'], start.isoformat())
+            self.assertEqual(series['buckets'][-1]['end'], end.isoformat())
+            for bucket in series['buckets']:
+                expected = line_metrics(
+                    self.line, pd.Timestamp(bucket['start']).to_pydatetime(), pd.Timestamp(bucket['end']).to_pydatetime()
+                )
+                del expected['line_name']
+                for key, value in expected.items():
+                    self.assertAlmostEqual(bucket[key], value, places=6, msg=f"{interval} {bucket['start']} {key}")
+
+    def test_buckets_match_single_window_metrics(self):
+        start, end = self.start + timedelta(minutes=7), self.start + timedelta(days=2, minutes=-20)
+        self.assertMatchesWindows(start, end)
+
+        # Counters then come from the rollups, plus rows written after them.
+        refresh_rollups()
+        self.write(1)
+        self.assertMatchesWindows(start, end)
+
+    def test_rows_written_during_a_refresh_are_counted_once(self):
+        start, end = self.start + timedelta(minutes=7), self.start + timedelta(days=2, minutes=-20)
+        rollup_raw, save_state = rollups._rollup_raw, DaqLogRollupState.save
+        # Lands in a bucket the first batch recomputes.
+        stamp = DaqLog.objects.filter(tag=self.tags[0], timestamp__gt=start + timedelta(hours=3)).earliest('timestamp').timestamp
+        inserted, checked = [], []
+
+        def concurrent_insert(*args):
+            if not inserted:
+                inserted.append(write_daqlogs([self.tags[0].id], [stamp], [10.0], live=False))
+            return rollup_raw(*args)
+
+        def check_after_batch(state, *args, **kwargs):
+            # Metrics served between this batch and the one picking the row up.
+            save_state(state, *args, **kwargs)
+            if inserted and not checked:
+                checked.append(state.last_log_id)
+                self.assertMatchesWindows(start, end)
+
+        with mock.patch.object(rollups, '_rollup_raw', side_effect=concurrent_insert), \
+                mock.patch.object(DaqLogRollupState, 'save', autospec=True, side_effect=check_after_batch):
+            refresh_rollups()
+        self.assertEqual(len(checked), 1)
+
+    def test_shift_edges_off_the_rollup_grid(self):
+        calendar = ShiftCalendar.objects.create(plant=self.line.block.plant, name='Three shifts', timezone='UTC')
+        for name, hour in (('A', 6), ('B', 14), ('C', 22)):
+            Shift.objects.create(calendar=calendar, name=name, start_time=clock_time(hour, 10),
+                                 end_time=clock_time((hour + 8) % 24, 10))
+        refresh_rollups()
+        self.assertMatchesWindows(self.start + timedelta(minutes=7), self.start + timedelta(days=2, minutes=-20))
+
+    def test_series_endpoint(self):
+        params = {
+            'line_id': self.line.id,
+            'start_date': self.start.isoformat(),
+            'end_date': (self.start + timedelta(days=1)).isoformat(),
+            'interval': 'shift',
+        }
+        response = self.client.get('/api/production-metrics/series/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['line_name'], 'Line 1')
+
+        response = self.client.get('/api/production-metrics/series/', {**params, 'interval': 'week'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(DAQLOG_ROLLUP_SETTLE_SECONDS=0)
+class RollupRefreshTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        _, tags = create_line(block, tag_type, 'Line 1', tags=[('Production', SensorTag.PRODUCTION)])
+        self.tag = tags[0]
+        self.day = (timezone.now() - timedelta(days=2)).astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def write(self, *readings):
+        write_daqlogs([self.tag.id] * len(readings), [stamp for stamp, _ in readings], [value for _, value in readings], live=False)
+
+    def rollup(self, resolution, bucket):
+        return DaqLogRollup.objects.get(tag=self.tag, resolution=resolution, bucket=bucket)
+
+    def test_only_touched_buckets_are_recomputed(self):
+        at = lambda hour, second: self.day + timedelta(hours=hour, seconds=second)
+        self.write((at(10, 30), 1.0), (at(12, 30), 2.0), (at(14, 30), 3.0))
+        refresh_rollups()
+
+        # Changed in place, so no new row marks 12:00 dirty again.
+        DaqLog.objects.filter(timestamp=at(12, 30)).update(value=50.0)
+        self.write((at(10, 45), 4.0), (at(14, 45), 5.0))
+        refresh_rollups()
+
+        self.assertEqual(self.rollup('1m', at(12, 0)).max_value, 2.0)
+        self.assertEqual(self.rollup('1h', at(12, 0)).max_value, 2.0)
+        self.assertEqual(self.rollup('1m', at(10, 0)).count, 2)
+        self.assertEqual(self.rollup('1h', at(14, 0)).last_value, 5.0)
+        self.assertEqual(self.rollup('1d', self.day).sum_value, 1.0 + 2.0 + 3.0 + 4.0 + 5.0)
+
+    @override_settings(DAQLOG_ROLLUP_SETTLE_SECONDS=60)
+    def test_rows_from_unsettled_transactions_hold_the_watermark(self):
+        at = self.day + timedelta(hours=10)
+        recent, settled = timezone.now() - timedelta(seconds=30), timezone.now() - timedelta(seconds=120)
+        for log_id, value in ((10, 1.0), (20, 2.0)):
+            DaqLog.objects.create(id=log_id, tag=self.tag, timestamp=at + timedelta(seconds=log_id), value=value)
+        DaqLog.objects.filter(id=10).update(modified=settled)
+        DaqLog.objects.filter(id=20).update(modified=recent)
+        refresh_rollups()
+        self.assertEqual(DaqLogRollupState.objects.get(id=1).last_log_id, 10)
+        self.assertEqual(self.rollup('1m', at).sum_value, 1.0)
+
+        # A transaction that began before id 20 commits a lower id afterwards.
+        DaqLog.objects.create(id=15, tag=self.tag, timestamp=at + timedelta(seconds=15), value=4.0)
+        DaqLog.objects.filter(id__in=[15, 20]).update(modified=settled)
+        refresh_rollups()
+        self.assertEqual(DaqLogRollupState.objects.get(id=1).last_log_id, 20)
+        self.assertEqual(self.rollup('1m', at).sum_value, 7.0)
+
+    def test_buckets_before_retention_cutoff_are_skipped(self):
+        cutoff = archive.retention_cutoff()
+        self.write((cutoff - timedelta(minutes=30), 1.0), (self.day + timedelta(seconds=30), 2.0))
+        refresh_rollups()
+
+        rollups = DaqLogRollup.objects.filter(tag=self.tag)
+        self.assertFalse(rollups.filter(bucket__lt=cutoff).exists())
+        self.assertEqual(sorted(rollups.values_list('resolution', flat=True)), ['15m', '1d', '1h', '1m'])
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.line, tags = create_line(block, tag_type, 'Line 1')
+        self.tag = tags[0]
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        overrides = override_settings(DAQLOG_ARCHIVE_DIR=Path(archive_dir.name), DAQLOG_RETENTION_DAYS=30)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        # Hourly readings over the two months before the cutoff, and a recent one.
+        self.cutoff = archive.retention_cutoff()
+        self.start = self.cutoff - timedelta(days=40)
+        stamps = [self.start + timedelta(hours=hour, seconds=30) for hour in range(40 * 24)]
+        write_daqlogs([self.tag.id] * len(stamps), stamps, [1.0] * len(stamps), live=False)
+        write_daqlogs([self.tag.id], [timezone.now() - timedelta(hours=1)], [2.0], live=False)
+        self.archived_ids = list(DaqLog.objects.filter(timestamp__lt=self.cutoff).order_by('timestamp').values_list('id', flat=True))
+        self.assertEqual(archive.archive_daqlogs(batch_size=100), len(stamps))
+
+    def test_archived_rows_read_back_in_bounded_chunks(self):
+        self.assertFalse(DaqLog.objects.filter(timestamp__lt=self.cutoff).exists())
+        self.assertEqual(len(list(Path(archive.archive_dir()).glob('tag=*/*.parquet'))), 2)
+
+        chunks = list(archive.archive_chunks(self.tag.id, self.start, timezone.now(), ('id', 'timestamp'), size=100))
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertEqual([log_id for chunk in chunks for log_id, _ in chunk], self.archived_ids)
+
+        params = {
+            'LineId': self.line.id, 'MachineId': self.tag.machine_id, 'TagId': self.tag.id, 'Format': 'ndjson',
+            'StartDate': self.start.isoformat(), 'EndDate': timezone.now().isoformat(),
+        }
+        response = self.client.get('/api/daqlogs/', params)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows[:-1]], self.archived_ids)
+        self.assertEqual(rows[-1]['value'], 2.0)
+
+        response = self.client.get('/api/async/daqlogs/', params)
+        self.assertEqual(async_to_sync(read_stream)(response).decode().splitlines(), [json.dumps(row) for row in rows])
+
+    def test_metrics_reject_archived_windows(self):
+        window = {'start_date': self.start.isoformat(), 'end_date': timezone.now().isoformat()}
+        response = self.client.get('/api/production-metrics/', {'line_id': self.line.id, **window})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('archived', response.json()['error'])
+        response = self.client.get('/api/machine-performance/', {'StartDate': window['start_date'], 'EndDate': window['end_date']})
+        self.assertEqual(response.status_code, 400)
+
+        window['start_date'] = self.cutoff.isoformat()
+        response = self.client.get('/api/production-metrics/', {'line_id': self.line.id, **window})
+        self.assertEqual(response.json()['production'], 2.0)
+
+
+class ShiftCalendarTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        self.block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.line, self.tags = create_line(self.block, tag_type, 'Line 1')
+        calendar = ShiftCalendar.objects.create(plant=plant, name='Three shifts', timezone='UTC')
+        for name, start, end in (('A', 6, 14), ('B', 14, 22), ('C', 22, 6)):
+            Shift.objects.create(calendar=calendar, name=name, start_time=clock_time(start), end_time=clock_time(end))
+        self.day = (timezone.now() - timedelta(days=3)).date()
+        self.day_start = datetime.combine(self.day, clock_time(6), tzinfo=dt_timezone.utc)
+
+    def test_selectors_resolve_to_shift_boundaries(self):
+        self.assertEqual(resolve_window(self.line.id, self.day.isoformat(), 'C'),
+                         (self.day_start + timedelta(hours=16), self.day_start + timedelta(hours=24)))
+        self.assertEqual(resolve_window(self.line.id, self.day.isoformat()),
+                         (self.day_start, self.day_start + timedelta(hours=24)))
+
+        # A block calendar takes precedence over the plant's.
+        calendar = ShiftCalendar.objects.create(plant=self.block.plant, block=self.block, name='Days', timezone='UTC')
+        Shift.objects.create(calendar=calendar, name='Day', start_time=clock_time(7), end_time=clock_time(19))
+        self.assertEqual(resolve_window(self.line.id, self.day.isoformat()),
+                         (self.day_start + timedelta(hours=1), self.day_start + timedelta(hours=13)))
+        with self.assertRaises(ValueError):
+            resolve_window(self.line.id, self.day.isoformat(), 'C')
+
+    def test_unknown_time_zone_falls_back_to_plant_calendar(self):
+        calendar = ShiftCalendar(plant=self.block.plant, block=self.block, name='Days', timezone='Mars/Olympus')
+        with self.assertRaises(ValidationError):
+            calendar.full_clean()
+
+        calendar.save()
+        Shift.objects.create(calendar=calendar, name='Day', start_time=clock_time(7), end_time=clock_time(19))
+        with self.assertLogs('main.shifts', 'WARNING'):
+            self.assertEqual(resolve_window(self.line.id, self.day.isoformat(), 'C'),
+                             (self.day_start + timedelta(hours=16), self.day_start + timedelta(hours=24)))
+
+    def test_bad_weekdays_fall_back_to_plant_calendar(self):
+        calendar = ShiftCalendar.objects.create(plant=self.block.plant, block=self.block, name='Days', timezone='UTC')
+        for weekdays in ('0,1', '7', '00'):
+            with self.assertRaises(ValidationError):
+                Shift(calendar=calendar, name='Day', start_time=clock_time(7), end_time=clock_time(19),
+                      weekdays=weekdays).full_clean()
+
+        Shift.objects.create(calendar=calendar, name='Day', start_time=clock_time(7), end_time=clock_time(19),
+                             weekdays='0,1')
+        params = {'line_id': self.line.id, 'day': self.day.isoformat(), 'interval': 'shift'}
+        with self.assertLogs('main.shifts', 'WARNING'):
+            response = self.client.get('/api/production-metrics/series/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([bucket['shift'] for bucket in response.json()['buckets']], ['A', 'B', 'C'])
+
+    def test_shift_report_is_served_from_cache(self):
+        stamps = [self.day_start + timedelta(hours=hour, minutes=30) for hour in range(24)]
+        write_daqlogs([self.tags[0].id] * 24, stamps, [10] * 24, live=False)
+        params = {'line_id': self.line.id, 'day': self.day.isoformat(), 'shift': 'B'}
+
+        response = self.client.get('/api/production-metrics/', params)
+        self.assertEqual(response.json()['production'], 80)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/production-metrics/', params).json(), response.json())
+
+        response = self.client.get('/api/production-metrics/series/', {**params, 'shift': '', 'interval': 'shift'})
+        self.assertEqual([(bucket['shift'], bucket['production']) for bucket in response.json()['buckets']],
+                         [('A', 80), ('B', 80), ('C', 80)])
+
+
+class DaqLogBatchViewTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        _, self.tags = create_line(block, tag_type, 'Line 1')
+        self.stamp = (timezone.now() - timedelta(minutes=5)).isoformat()
+
+    def post_ndjson(self, lines):
+        return self.client.post('/api/daqlogs/batch/', '\n'.join(lines), content_type='application/x-ndjson')
+
+    def test_columns(self):
+        tag = self.tags[0].id
+        response = self.client.post('/api/daqlogs/batch/', {
+            'tag_ids': [tag, tag, 999999], 'timestamps': [self.stamp, 'soon', self.stamp], 'values': [1, 2, 3],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'inserted': 1, 'errors': [
+            {'index': 1, 'error': 'Invalid timestamp.'}, {'index': 2, 'error': 'Unknown tag.'},
+        ]})
+
+        response = self.client.post('/api/daqlogs/batch/', {'tag_ids': [tag], 'timestamps': [], 'values': []},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_ndjson_rows_report_why_they_were_rejected(self):
+        row = json.dumps({'tag': self.tags[0].id, 'timestamp': self.stamp, 'value': 1.5})
+        response = self.post_ndjson([row, '{"tag": 1,', '[1, 2]', '', row])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'inserted': 2, 'errors': [
+            {'index': 1, 'error': 'Invalid JSON.'}, {'index': 2, 'error': 'Row must be an object.'},
+        ]})
+        self.assertEqual(DaqLog.objects.filter(tag=self.tags[0]).count(), 2)
+
+        response = self.post_ndjson(['not json'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'index': 0, 'error': 'Invalid JSON.'}])
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024, DAQLOG_BATCH_MAX_BYTES=64 * 1024)
+    def test_batch_size_limit(self):
+        row = json.dumps({'tag': self.tags[0].id, 'timestamp': self.stamp, 'value': 1.5})
+        response = self.post_ndjson([row] * 100)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['inserted'], 100)
+
+        response = self.post_ndjson([row] * 1000)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('split the batch', response.json()['error'])
+
+
+class WriteBehindBufferTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        _, self.tags = create_line(block, tag_type, 'Line 1')
+        spill_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spill_dir.cleanup)
+        self.spill_dir = Path(spill_dir.name)
+        self.now = timezone.now()
+
+    def make_buffer(self, **options):
+        # Started without the flusher thread; the tests flush explicitly.
+        write_behind = buffer.WriteBehindBuffer(self.spill_dir, **options)
+        write_behind._recover()
+        write_behind._open_segment()
+        return write_behind
+
+    def submit(self, write_behind, count):
+        return write_behind.submit([self.tags[0].id] * count, [self.now] * count, [1.0] * count)
+
+    def test_flush_inserts_once_even_when_hooks_fail(self):
+        write_behind = self.make_buffer()
+        self.submit(write_behind, 3)
+        with mock.patch.object(buffer, 'after_write', side_effect=RuntimeError), self.assertLogs('main.buffer', 'ERROR'):
+            write_behind.flush()
+            write_behind.flush()
+        self.assertEqual(DaqLog.objects.count(), 3)
+        self.assertEqual(write_behind.pending, [])
+        self.assertEqual([path.suffix for path in self.spill_dir.iterdir()], ['.ndjson'])
+
+    def test_rejected_segment_moves_to_dead_letter(self):
+        write_behind = self.make_buffer()
+        write_behind.submit([self.tags[0].id], [self.now], [None])
+        self.submit(write_behind, 2)
+        with self.assertLogs('main.buffer', 'ERROR'):
+            write_behind.flush()
+        self.assertEqual(DaqLog.objects.count(), 0)
+        self.assertEqual(len(list(self.spill_dir.glob('*.dead'))), 1)
+
+        # The segment behind it is no longer blocked.
+        self.submit(write_behind, 2)
+        write_behind.flush()
+        self.assertEqual(DaqLog.objects.count(), 2)
+
+    def test_unavailable_database_is_retried_with_backoff(self):
+        write_behind = self.make_buffer(max_rows=4, flush_interval=1.0, max_backoff=30.0)
+        self.submit(write_behind, 3)
+        delays = []
+        with mock.patch.object(buffer, 'insert_daqlogs', side_effect=OperationalError('server has gone away')):
+            for _ in range(8):
+                with self.assertRaises(OperationalError):
+                    write_behind.flush()
+                delays.append(write_behind.retry_delay())
+        self.assertEqual(delays, [1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0, 30.0])
+        self.assertEqual(list(self.spill_dir.glob('*.dead')), [])
+        with self.assertRaises(buffer.BufferFull):
+            self.submit(write_behind, 2)
+
+        write_behind.flush()
+        self.assertEqual(DaqLog.objects.count(), 3)
+        self.assertEqual(write_behind.retry_delay(), 1.0)
+
+    def test_segments_of_a_crashed_process_are_replayed(self):
+        crashed = self.make_buffer()
+        self.submit(crashed, 4)
+        crashed.spill.close()
+
+        write_behind = self.make_buffer()
+        self.assertEqual(write_behind.pending_rows, 4)
+        write_behind.flush()
+        self.assertEqual(DaqLog.objects.count(), 4)
+
+    @override_settings(DAQLOG_WRITE_BEHIND=True)
+    def test_full_buffer_answers_429(self):
+        write_behind = self.make_buffer(max_rows=3)
+        self.addCleanup(write_behind.spill.close)
+        with mock.patch.object(buffer, '_buffer', write_behind):
+            rows = [{'tag': self.tags[0].id, 'timestamp': self.now.isoformat(), 'value': 1} for _ in range(2)]
+            response = self.client.post('/api/daqlogs/batch/', rows, content_type='application/json')
+            self.assertEqual(response.status_code, 202)
+            response = self.client.post('/api/daqlogs/batch/', rows, content_type='application/json')
+            self.assertEqual(response.status_code, 429)
+
+            write_behind.flush()
+            response = self.client.post('/api/daqlogs/batch/', rows, content_type='application/json')
+            self.assertEqual(response.status_code, 202)
+
+
+class LatestValueTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        _, self.tags = create_line(block, tag_type, 'Line 1')
+        # Tag ids can be reused between tests, so start from an empty mirror.
+        latest._mirror.update(values={}, watermark=None, checked=0.0)
+
+    def test_future_readings_do_not_pin_the_latest_value(self):
+        tag_id = self.tags[0].id
+        now = timezone.now()
+        write_daqlogs([tag_id], [now + timedelta(days=7)], [99.0], live=False)
+        write_daqlogs([tag_id], [now], [1.0], live=False)
+        self.assertEqual(latest.latest_values([tag_id])[0]['value'], 1.0)
+
+        write_daqlogs([tag_id], [now - timedelta(minutes=1)], [2.0], live=False)
+        self.assertEqual(latest.latest_values([tag_id])[0]['value'], 1.0)
+
+    def test_older_readings_from_another_worker_do_not_win(self):
+        tag_id = self.tags[0].id
+        now = timezone.now()
+        write_daqlogs([tag_id], [now], [1.0], live=False)
+
+        # A worker whose mirror has not seen that reading yet.
+        latest._mirror.update(values={}, watermark=None, checked=time.monotonic())
+        write_daqlogs([tag_id, self.tags[1].id], [now - timedelta(minutes=1)] * 2, [2.0, 3.0], live=False)
+        self.assertEqual(list(SensorTagLatest.objects.order_by('tag_id').values_list('value', flat=True)), [1.0, 3.0])
+
+        latest._mirror.update(values={}, watermark=None, checked=0.0)
+        response = self.client.get('/api/latest-values/', {'MachineId': self.tags[0].machine_id})
+        self.assertEqual(response.json(), [
+            {'tag': tag_id, 'timestamp': format_datetime(now), 'value': 1.0},
+            {'tag': self.tags[1].id, 'timestamp': format_datetime(now - timedelta(minutes=1)), 'value': 3.0},
+        ])
+        response = self.client.get('/api/latest-values/', {'LineId': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.line, self.tags = create_line(block, tag_type, 'Line 1')
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=3)
+        stamps = [self.start + timedelta(minutes=i) for i in range(120)]
+        write_daqlogs([self.tags[0].id] * 120, stamps, [float(i % 7) for i in range(120)], live=False)
+        write_daqlogs([self.tags[1].id] * 12, stamps[::10], [0.5] * 12, live=False)
+        alerts._state['ids'] = None
+        write_daqlogs([self.tags[0].id] * 2, [stamps[5], stamps[90]], [5000.0, -5.0])
+        self.window = {'start_date': self.start.isoformat(), 'end_date': (self.start + timedelta(hours=2)).isoformat()}
+        cache.clear()
+
+    def test_metrics_match_the_sync_view(self):
+        params = {'line_id': self.line.id, **self.window}
+        response = self.client.get('/api/async/production-metrics/', params)
+        self.assertEqual(response.status_code, 200)
+        metrics = response.json()
+        self.assertEqual((metrics['production'], metrics['downtime']), (sum(i % 7 for i in range(120)) + 4995.0, 6.0))
+        cache.clear()
+        self.assertEqual(self.client.get('/api/production-metrics/', params).json(), metrics)
+
+        params = {'line_id': self.line.id, 'day': self.start.date().isoformat()}
+        cache.clear()
+        response = self.client.get('/api/async/production-metrics/', params)
+        cache.clear()
+        self.assertEqual(response.json(), self.client.get('/api/production-metrics/', params).json())
+
+    def test_metrics_errors(self):
+        for params, status_code in (
+            ({'line_id': self.line.id}, 400),
+            ({'line_id': self.line.id, 'start_date': 'yesterday', 'end_date': 'today'}, 400),
+            ({'line_id': self.line.id, 'start_date': self.window['end_date'], 'end_date': self.window['start_date']}, 400),
+            ({'line_id': 999999, **self.window}, 404),
+        ):
+            response = self.client.get('/api/async/production-metrics/', params)
+            self.assertEqual(response.status_code, status_code, params)
+            self.assertIn('error', response.json())
+
+    def test_alerts_and_daqlogs_match_the_sync_views(self):
+        window = {'StartDate': self.window['start_date'], 'EndDate': self.window['end_date']}
+        for params in ({}, window, {**window, 'Line': self.line.id}):
+            response = self.client.get('/api/async/alerts/', params)
+            self.assertEqual(len(response.json()), 2)
+            self.assertEqual(response.json(), self.client.get('/api/alerts/', params).json())
+
+        params = {'LineId': self.line.id, 'MachineId': self.tags[0].machine_id, 'TagId': self.tags[0].id, **window}
+        response = self.client.get('/api/async/daqlogs/', params)
+        self.assertEqual(len(response.json()), 122)
+        self.assertEqual(response.json(), self.client.get('/api/daqlogs/', params).json())
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        self.line, self.tags = create_line(block, tag_type, 'Line 1')
+        _, self.other_tags = create_line(block, tag_type, 'Line 2')
+        self.now = timezone.now()
+        alerts._state['ids'] = None
+
+    async def test_readings_and_alerts_reach_subscribers_in_scope(self):
+        response = await self.async_client.get('/api/events/', {'LineId': self.line.id})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        tag, other = self.tags[0].id, self.other_tags[0].id
+        await sync_to_async(write_daqlogs)([other, tag, tag], [self.now] * 3, [1.0, 2.0, 5000.0])
+        messages = (await asyncio.wait_for(anext(stream), 5)).decode().split('\n\n')[:-1]
+        events = [(message.split('\n')[0], json.loads(message.split('\n')[1][len('data: '):])) for message in messages]
+        self.assertEqual([(name, payload['tag']) for name, payload in events],
+                         [('event: reading', tag), ('event: reading', tag), ('event: alert', tag)])
+        self.assertEqual(events[1][1], {'tag': tag, 'timestamp': format_datetime(self.now), 'value': 5000.0})
+        await stream.aclose()
+
+    @override_settings(PUSH_KEEPALIVE_SECONDS=0.01)
+    async def test_idle_streams_keep_alive_and_unsubscribe_on_close(self):
+        subscribers = push.get_broker().subscribers
+        before = set(subscribers)
+        stream = push.event_stream(tags=[self.tags[0].id])
+        self.assertEqual(await anext(stream), 'retry: 3000\n\n')
+        self.assertEqual(len(subscribers - before), 1)
+        # Readings for other tags are filtered out; the client only sees keepalives.
+        await sync_to_async(write_daqlogs)([self.other_tags[0].id], [self.now], [1.0])
+        self.assertEqual(await anext(stream), ': keepalive\n\n')
+        await stream.aclose()
+        self.assertEqual(subscribers - before, set())
+
+
+class TimeSeriesPaginationTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        line, tags = create_line(block, tag_type, 'Line 1')
+        alert = Alert.objects.create(line=line, tag=tags[0], timestamp=clock_time(8), name='High Production')
+        incident = Incident.objects.create(
+            alert=alert, title='Jam', location=block, line=line, tag=tags[0], date=timezone.now().date(),
+        )
+        user = AuthUser.objects.create(role=AuthRole.objects.create(name='Operator'), name='Op', email='op@example.com')
+        # Several rows share a timestamp, so the id tie-break matters.
+        now = timezone.now()
+        IncidentTransaction.objects.bulk_create([
+            IncidentTransaction(incident=incident, issued_by=user, timestamp=now + timedelta(seconds=i // 3), msg=str(i))
+            for i in range(10)
+        ])
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        url, ids = '/api/incident-transactions/?page_size=4', []
+        while url:
+            data = self.client.get(url).json()
+            ids += [row['id'] for row in data['results']]
+            url = data['next']
+        expected = list(IncidentTransaction.objects.order_by('timestamp', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_deep_pages_seek_on_the_timestamp_index(self):
+        cursor = (timezone.now(), 5)
+        for model, index in ((DaqLog, 'ap_daqlog_ts_id_idx'), (IncidentTransaction, 'ap_incidenttx_ts_id_idx')):
+            queryset = TimeSeriesCursorPagination().seek(model.objects.all(), cursor)[:500]
+            self.assertIn(index, queryset.explain())
+
+
+class BackfillCheckpointTests(TestCase):
+    def setUp(self):
+        plant = Plant.objects.create(name='Plant', address='Address')
+        block = Block.objects.create(plant=plant, name='Block')
+        tag_type = SensorTagType.objects.create(name='Counter', units='pcs')
+        _, self.tags = create_line(block, tag_type, 'Line 1', tags=[('Production', SensorTag.PRODUCTION)] * 4)
+        export = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        self.addCleanup(os.unlink, export.name)
+        start = timezone.now() - timedelta(days=1)
+        frame = pd.DataFrame({
+            'tag_id': [tag.id for tag in self.tags] * 25,
+            'timestamp': [(start + timedelta(minutes=i)).isoformat() for i in range(100)],
+            'value': np.arange(100, dtype=float),
+        })
+        frame.to_csv(export, index=False)
+        export.close()
+        self.path = export.name
+
+    def run_import(self, workers):
+        return sum(
+            backfill.load(self.path, 30, tag_range)[0]
+            for tag_range in backfill.plan_ranges(self.path, workers)
+        )
+
+    def test_rerun_resumes_without_duplicates(self):
+        self.assertEqual(self.run_import(2), 100)
+        self.assertEqual(self.run_import(2), 0)
+        self.assertEqual(DaqLog.objects.count(), 100)
+
+    def test_resume_with_a_different_split_is_refused(self):
+        imported, _ = backfill.load(self.path, 30, backfill.plan_ranges(self.path, 2)[0])
+        self.assertGreater(imported, 0)
+        with self.assertRaises(ValueError):
+            backfill.plan_ranges(self.path, 1)
+        with self.assertRaises(ValueError):
+            backfill.plan_ranges(self.path, 3)
+
+    def test_progress_goes_to_the_command_stdout(self):
+        stdout = io.StringIO()
+        call_command('backfill_daqlogs', self.path, chunk_size=30, stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual([line.split(': ')[1].split(',')[0] for line in lines[:-1]],
+                         ['30 rows', '60 rows', '90 rows', '100 rows'])
+        self.assertIn('Imported 100 logs', lines[-1])
+
+        # Workers hand their updates to the parent through a queue.
+        updates, finished = queue.Queue(), Future()
+        finished.set_result((0, 0))
+        backfill.QueueProgress(updates)('worker', 10, 1, 2.0)
+        command = BackfillCommand(stdout=io.StringIO())
+        command.relay_progress(updates, [finished])
+        self.assertEqual(command.stdout.getvalue(), 'worker: 10 rows, 1 rejected, 5 rows/s\n')
+
+    def test_tags_added_later_fall_in_the_last_range(self):
+        ranges = backfill.plan_ranges(self.path, 2)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertIsNone(ranges[-1][1])
+
+
+class PartitionTests(TestCase):
+    def use_mysql(self):
+        # A MySQL connection that records the DDL; results are queued per fetchall().
+        self.executed, self.results = [], []
+        cursor = mock.MagicMock()
+        cursor.execute.side_effect = lambda sql, params=None: self.executed.append(sql)
+        cursor.fetchall.side_effect = lambda: self.results.pop(0)
+        fake = mock.MagicMock(vendor='mysql')
+        fake.cursor.return_value.__enter__.return_value = cursor
+        patcher = mock.patch.object(partitions, 'connection', fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_init_partitions_each_month_and_drops_foreign_keys(self):
+        self.use_mysql()
+        self.results = [[], [('ap_DaqLog_tag_id_fk',)]]
+        partitions.create_partitions(datetime(2025, 11, 20).date(), datetime(2026, 1, 1).date())
+        self.assertEqual(self.executed[2:], [
+            "ALTER TABLE `ap_DaqLog` DROP FOREIGN KEY `ap_DaqLog_tag_id_fk`",
+            "ALTER TABLE `ap_DaqLog` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `timestamp`)",
+            "ALTER TABLE `ap_DaqLog` PARTITION BY RANGE (TO_DAYS(`timestamp`)) ("
+            "PARTITION p202511 VALUES LESS THAN (TO_DAYS('2025-12-01')), "
+            "PARTITION p202512 VALUES LESS THAN (TO_DAYS('2026-01-01')), "
+            "PARTITION p202601 VALUES LESS THAN (TO_DAYS('2026-02-01')), "
+            "PARTITION pmax VALUES LESS THAN MAXVALUE)",
+        ])
+
+        self.results = [[('p202511', '739951', 0), ('pmax', 'MAXVALUE', 0)]]
+        with self.assertRaisesMessage(RuntimeError, 'already partitioned'):
+            partitions.create_partitions(datetime(2025, 11, 1).date(), datetime(2026, 1, 1).date())
+
+    def test_extend_and_drop(self):
+        self.use_mysql()
+        existing = [('p202511', '', 0), ('p202512', '', 0), ('pmax', 'MAXVALUE', 0)]
+        self.results = [existing]
+        self.assertEqual(partitions.extend_partitions(datetime(2026, 2, 1).date()), ['p202601', 'p202602'])
+        self.assertEqual(self.executed[-1],
+                         "ALTER TABLE `ap_DaqLog` REORGANIZE PARTITION pmax INTO ("
+                         "PARTITION p202601 VALUES LESS THAN (TO_DAYS('2026-02-01')), "
+                         "PARTITION p202602 VALUES LESS THAN (TO_DAYS('2026-03-01')), "
+                         "PARTITION pmax VALUES LESS THAN MAXVALUE)")
+
+        self.results = [existing]
+        self.assertEqual(partitions.drop_partitions(datetime(2025, 12, 15).date()), ['p202511'])
+        self.assertEqual(self.executed[-1], "ALTER TABLE `ap_DaqLog` DROP PARTITION p202511")
+
+        self.results = [[]]
+        with self.assertRaisesMessage(RuntimeError, 'not partitioned'):
+            partitions.extend_partitions(datetime(2026, 2, 1).date())
+
+    @skipUnless(connection.vendor != 'mysql', 'Needs a non-MySQL test database')
+    def test_command_refuses_other_backends(self):
+        message = f'requires MySQL, not {connection.vendor}'
+        for action in ('init', 'extend', 'list'):
+            with self.assertRaisesMessage(CommandError, message):
+                call_command('daqlog_partitions', action)
+        with self.assertRaisesMessage(CommandError, message):
+            call_command('daqlog_partitions', 'drop', before='2026-01')
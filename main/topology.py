@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils.http import parse_etags
+
+from .models import Block, Line, Machine, Plant, SensorTag, SensorTagType, Shift, ShiftCalendar
+from .serializers import LineSerializer, MachineDetailSerializer, SensorTagSerializer
+
+# The Plant -> Block -> Line -> Machine -> SensorTag hierarchy (plus the shift
+# calendars, which decide metric windows) is versioned by a digest of the row
+# count and latest modified stamp of each table. It is read from the database,
+# so every worker derives the same version whatever the cache backend; each
+# process re-reads it at most every TOPOLOGY_VERSION_TTL seconds, and at once
+# after a save or delete in that process (see signals.py). A new version
+# retires cached snapshots, derived lookups and client ETags. Writes that skip
+# modified (queryset.update()) must set it themselves.
+
+TOPOLOGY_MODELS = (Plant, Block, Line, Machine, SensorTagType, SensorTag, ShiftCalendar, Shift)
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+_local = {'version': None, 'snapshot': None}
+_derived = {}
+_checked = {'version': None, 'at': None}
+_lock = threading.Lock()
+
+
+def _read_version():
+    sql = ' UNION ALL '.join(
+        'SELECT {}, COUNT(*), MAX({}) FROM {}'.format(
+            position, connection.ops.quote_name('modified'), connection.ops.quote_name(model._meta.db_table)
+        )
+        for position, model in enumerate(TOPOLOGY_MODELS)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        rows = sorted(cursor.fetchall())
+    return hashlib.md5(repr(rows).encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def get_version():
+    ttl = getattr(settings, 'TOPOLOGY_VERSION_TTL', 2.0)
+    now = time.monotonic()
+    with _lock:
+        if _checked['at'] is not None and now - _checked['at'] < ttl:
+            return _checked['version']
+    version = _read_version()
+    with _lock:
+        _checked.update(version=version, at=now)
+    return version
+
+
+def bump_version():
+    """Re-read the version on the next get_version() in this process."""
+    with _lock:
+        _checked['at'] = None
+
+
+def make_etag(version, *parts):
+    if not parts:
+        return f'"topology-{version}"'
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    return f'"topology-{version}-{digest[:16]}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def build_snapshot():
+    lines = Line.objects.prefetch_related('machine_set__sensortag_set')
+    result = []
+
+    for line in lines:
+        line_fields = LineSerializer(line).data
+        line_data = dict(line_fields)
+        line_data['machines'] = []
+
+        context = {'lines': {line.id: line_fields}}
+        for machine in line.machine_set.all():
+            machine_data = MachineDetailSerializer(machine, context=context).data
+            machine_data['tags'] = SensorTagSerializer(machine.sensortag_set.all(), many=True).data
+            line_data['machines'].append(machine_data)
+
+        result.append(line_data)
+
+    return result
+
+
+def get_snapshot(version):
+    if _local['version'] == version:
+        return _local['snapshot']
+
+    key = f'topology:snapshot:{version}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot()
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+
+    _local['version'], _local['snapshot'] = version, snapshot
+    return snapshot
+
+
+def versioned(name, builder):
+    """Memoise builder() in-process until the topology version changes."""
+    version = get_version()
+    cached = _derived.get(name)
+    if cached is None or cached[0] != version:
+        cached = (version, builder())
+        _derived[name] = cached
+    return cached[1]
@@ -3,18 +3,26 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (
     AlertView,
+    AsyncAlertView,
+    AsyncDaqLogView,
+    AsyncProductionMetricsView,
     AuthRoleViewSet,
     AuthUserViewSet,
     BlockViewSet,
     ControlPanelDataView,
+    DaqLogBatchView,
+    DaqLogQueryView,
     DaqLogView,
+    EventStreamView,
     IncidentTransactionViewSet,
     IncidentViewSet,
+    LatestValuesView,
     LineViewSet,
     MachinePerformanceView,
     MachineViewSet,
     PlantViewSet,
     ProductionLineDetailView,
+    ProductionMetricsSeriesView,
     ProductionMetricsView,
     SensorTagTypeViewSet,
     SensorTagViewSet,
@@ -36,8 +44,16 @@ urlpatterns = [
     path('', include(router.urls)),
     path('alerts/', AlertView.as_view(), name='alerts'),
     path('daqlogs/', DaqLogView.as_view(), name='daqlogs'),
+    path('daqlogs/batch/', DaqLogBatchView.as_view(), name='daqlogs-batch'),
+    path('daqlogs/query/', DaqLogQueryView.as_view(), name='daqlogs-query'),
+    path('events/', EventStreamView.as_view(), name='events'),
+    path('latest-values/', LatestValuesView.as_view(), name='latest-values'),
     path('machine-performance/', MachinePerformanceView.as_view(), name='machine-performance'),
     path('production-line-details/', ProductionLineDetailView.as_view(), name='production-line-details'),
     path('production-metrics/', ProductionMetricsView.as_view(), name='production-metrics'),
+    path('production-metrics/series/', ProductionMetricsSeriesView.as_view(), name='production-metrics-series'),
     path('control-panel-data/', ControlPanelDataView.as_view(), name='control-panel-data'),
+    path('async/alerts/', AsyncAlertView.as_view(), name='async-alerts'),
+    path('async/daqlogs/', AsyncDaqLogView.as_view(), name='async-daqlogs'),
+    path('async/production-metrics/', AsyncProductionMetricsView.as_view(), name='async-production-metrics'),
 ]
\ No newline at end of file
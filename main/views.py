@@ -1,12 +1,35 @@
-import random
+import json
+from itertools import groupby
+from operator import itemgetter
 
-from django.db.models import Sum
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from django.db.models import Q, Sum
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
+from django.views import View
 from rest_framework import status, viewsets
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
+from . import topology
+from .archive import archive_chunks, read_archive, retention_cutoff
+from .buffer import BufferFull, get_buffer
+from .downsampling import METHODS, downsample
+from .ingest import after_write, control_panel_tags, control_panel_values, validate_readings, write_daqlogs
+from .latest import latest_values, scope_tag_ids
+from .metrics import (
+    INTERVALS,
+    acached_line_metrics,
+    aware,
+    cached_line_metrics,
+    check_retention,
+    cached_line_metrics_series,
+    line_windows,
+)
 from .models import (
     Alert,
     AuthRole,
@@ -21,11 +44,19 @@ from .models import (
     SensorTag,
     SensorTagType,
 )
+from .pagination import TimeSeriesCursorPagination
+from .parsers import INVALID_JSON, BatchJSONParser, BatchTooLarge, NDJSONParser
+from .push import event_stream, publish_alerts
+from .renderers import TIMESERIES_RENDERERS, rows_to_columns, wants_columnar
+from .rollups import RESOLUTIONS, pick_resolution, query_rollups, query_rollups_for_tags
 from .serializers import (
+    AlertFastSerializer,
     AlertSerializer,
     AuthRoleSerializer,
     AuthUserSerializer,
     BlockSerializer,
+    DaqLogFastSerializer,
+    DaqLogRollupSerializer,
     DaqLogSerializer,
     IncidentSerializer,
     IncidentTransactionSerializer,
@@ -34,53 +65,531 @@ from .serializers import (
     PlantSerializer,
     SensorTagSerializer,
     SensorTagTypeSerializer,
+    format_datetime,
 )
+from .shifts import resolve_window
+from .streaming import FORMATS, akeyset_chunks, stream_daqlogs
 
 
 class DaqLogView(APIView):
+    renderer_classes = TIMESERIES_RENDERERS
+
     def get(self, request):
         line_id = request.query_params.get('LineId')
         machine_id = request.query_params.get('MachineId')
         tag_id = request.query_params.get('TagId')
         start_date = request.query_params.get('StartDate')
         end_date = request.query_params.get('EndDate')
+        day = request.query_params.get('Day')
+        shift = request.query_params.get('Shift')
 
-        if not all([line_id, machine_id, tag_id, start_date, end_date]):
+        if not all([line_id, machine_id, tag_id]) or not (start_date and end_date or day or shift):
             return Response(
-                {"error": "LineId, MachineId, TagId, StartDate, and EndDate are required."},
+                {"error": "LineId, MachineId, TagId, and StartDate and EndDate or Day/Shift are required."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            start_date = parse_datetime(start_date)
-            end_date = parse_datetime(end_date)
-            if start_date is None or end_date is None:
-                raise ValueError
-        except ValueError:
-            return Response({"error": "Invalid date format."}, status=status.HTTP_400_BAD_REQUEST)
+            start_date, end_date = request_window(start_date, end_date, line_id, day, shift)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
 
         if start_date >= end_date:
             return Response({"error": "StartDate must be before EndDate."}, status=status.HTTP_400_BAD_REQUEST)
 
+        resolution = request.query_params.get('Resolution', 'raw')
+        if resolution != 'raw':
+            if resolution == 'auto':
+                resolution = pick_resolution(start_date, end_date)
+            elif resolution not in RESOLUTIONS:
+                return Response(
+                    {"error": f"Resolution must be one of raw, auto, {', '.join(RESOLUTIONS)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            rollups = query_rollups(tag_id, start_date, end_date, resolution).filter(
+                tag__machine__line_id=line_id,
+                tag__machine_id=machine_id,
+            )
+            serializer = DaqLogRollupSerializer(rollups, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        max_points = request.query_params.get('MaxPoints')
+        method = request.query_params.get('Method', 'lttb')
+        if max_points is not None:
+            try:
+                max_points = int(max_points)
+                if max_points < 3:
+                    raise ValueError
+            except ValueError:
+                return Response({"error": "MaxPoints must be an integer of at least 3."}, status=status.HTTP_400_BAD_REQUEST)
+            if method not in METHODS:
+                return Response(
+                    {"error": f"Method must be one of {', '.join(METHODS)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        fmt = request.query_params.get('Format', 'json')
+        if fmt not in FORMATS:
+            return Response(
+                {"error": f"Format must be one of {', '.join(FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         queryset = DaqLog.objects.filter(
             tag__machine__line_id=line_id,
             tag__machine_id=machine_id,
             tag_id=tag_id,
             timestamp__range=(start_date, end_date)
         )
-
-        serializer = DaqLogSerializer(queryset, many=True)
+        # Rows older than the retention window live in the Parquet archive.
+        archived = start_date < retention_cutoff() and SensorTag.objects.filter(
+            id=tag_id, machine_id=machine_id, machine__line_id=line_id
+        ).exists()
+
+        if fmt != 'json' and max_points is None:
+            chunks = archive_chunks(tag_id, start_date, end_date, DaqLogFastSerializer.columns) if archived else None
+            return stream_daqlogs(queryset, fmt, filename=f'daqlog-{tag_id}', archived=chunks)
+
+        if max_points is not None:
+            rows = list(queryset.order_by('timestamp').values_list('timestamp', 'value'))
+            if archived:
+                rows = sorted(read_archive(tag_id, start_date, end_date, ('timestamp', 'value')) + rows, key=itemgetter(0))
+            rows = downsample(rows, max_points, method)
+            if wants_columnar(request):
+                return Response(rows_to_columns(rows, ('timestamp', 'value')), status=status.HTTP_200_OK)
+            points = [
+                {"timestamp": timestamp, "value": value, "tag": int(tag_id)}
+                for timestamp, value in rows
+            ]
+            return Response(points, status=status.HTTP_200_OK)
+
+        if wants_columnar(request):
+            columns = ('id', 'timestamp', 'value')
+            rows = list(queryset.order_by('timestamp', 'id').values_list(*columns))
+            if archived:
+                rows = sorted(read_archive(tag_id, start_date, end_date, columns) + rows, key=itemgetter(1, 0))
+            return Response(rows_to_columns(rows, columns), status=status.HTTP_200_OK)
+
+        if archived:
+            columns = DaqLogFastSerializer.columns
+            rows = read_archive(tag_id, start_date, end_date, columns)
+            rows = sorted(rows + list(queryset.values_list(*columns)), key=itemgetter(1, 0))
+            tz = timezone.get_current_timezone()
+            return Response([DaqLogFastSerializer.to_dict(row, tz) for row in rows], status=status.HTTP_200_OK)
+
+        serializer = DaqLogFastSerializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     def post(self, request):
+        buffer = get_buffer()
+        if buffer is not None:
+            (tag_ids, timestamps, values), errors = validate_readings(
+                [request.data.get('tag')], [request.data.get('timestamp')], [request.data.get('value')]
+            )
+            if errors:
+                return Response({"error": errors[0]['error']}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                queued = buffer.submit(tag_ids, timestamps, values)
+            except BufferFull:
+                return Response({"error": "Ingest buffer is full, retry later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            return Response({"queued": queued}, status=status.HTTP_202_ACCEPTED)
+
         serializer = DaqLogSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            log = serializer.save()
+            after_write([log.tag_id], [log.timestamp], [log.value])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class DaqLogBatchView(APIView):
+    """Bulk ingest as columns (JSON) or one reading per line (NDJSON).
+
+    Bodies are limited to DAQLOG_BATCH_MAX_BYTES (32 MB by default, about
+    500k NDJSON rows) rather than DATA_UPLOAD_MAX_MEMORY_SIZE; larger
+    batches get a 413 and should be split.
+    """
+    parser_classes = [BatchJSONParser, NDJSONParser]
+
+    def post(self, request):
+        try:
+            data = request.data
+        except BatchTooLarge as exc:
+            return Response({"error": exc.detail}, status=exc.status_code)
+
+        row_errors = {}
+        if isinstance(data, dict):
+            tag_ids = data.get('tag_ids')
+            timestamps = data.get('timestamps')
+            values = data.get('values')
+            if not all(isinstance(column, list) for column in (tag_ids, timestamps, values)):
+                return Response(
+                    {"error": "tag_ids, timestamps, and values must be lists."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not len(tag_ids) == len(timestamps) == len(values):
+                return Response(
+                    {"error": "tag_ids, timestamps, and values must have the same length."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            if not isinstance(data, list):
+                return Response({"error": "Expected an object of columns or NDJSON rows."}, status=status.HTTP_400_BAD_REQUEST)
+            rows = []
+            for index, row in enumerate(data):
+                if not isinstance(row, dict):
+                    row_errors[index] = "Invalid JSON." if row is INVALID_JSON else "Row must be an object."
+                    row = {}
+                rows.append(row)
+            tag_ids = [row.get('tag') for row in rows]
+            timestamps = [row.get('timestamp') for row in rows]
+            values = [row.get('value') for row in rows]
+
+        (tag_ids, timestamps, values), errors = validate_readings(tag_ids, timestamps, values)
+        # Rows that were not objects fail on their missing tag; say why instead.
+        errors = [{"index": error["index"], "error": row_errors.get(error["index"], error["error"])} for error in errors]
+        if errors and not tag_ids:
+            return Response({"inserted": 0, "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        buffer = get_buffer()
+        if buffer is not None:
+            try:
+                queued = buffer.submit(tag_ids, timestamps, values)
+            except BufferFull:
+                return Response({"error": "Ingest buffer is full, retry later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            return Response({"queued": queued, "errors": errors}, status=status.HTTP_202_ACCEPTED)
+
+        write_daqlogs(tag_ids, timestamps, values)
+        return Response({"inserted": len(tag_ids), "errors": errors}, status=status.HTTP_201_CREATED)
+
+class DaqLogQueryView(APIView):
+    """Series for many tags over one window, grouped by tag.
+
+    Tags come from TagIds (comma-separated) or a LineId/MachineId scope. All
+    of them are read with one "tag_id IN (...)" range query; Resolution and
+    MaxPoints/Method work as on /daqlogs/.
+    """
+
+    def get(self, request):
+        params = request.query_params
+        start_date = params.get('StartDate')
+        end_date = params.get('EndDate')
+        day = params.get('Day')
+        shift = params.get('Shift')
+
+        has_scope = any(params.get(key) for key in ('TagIds', 'LineId', 'MachineId'))
+        if not (start_date and end_date or day or shift) or not has_scope:
+            return Response(
+                {"error": "StartDate and EndDate or Day/Shift, and one of TagIds, LineId or MachineId are required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            if params.get('TagIds'):
+                tag_ids = list(dict.fromkeys(int(value) for value in params['TagIds'].split(',') if value))
+            elif params.get('MachineId'):
+                tag_ids = scope_tag_ids(machine_id=int(params['MachineId']))
+            else:
+                tag_ids = scope_tag_ids(line_id=int(params['LineId']))
+        except ValueError:
+            return Response({"error": "TagIds, LineId and MachineId must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Day/Shift follow the calendar of LineId, else of the first tag's line.
+        line_id = params.get('LineId')
+        if line_id is None and tag_ids:
+            line_id = SensorTag.objects.filter(id=tag_ids[0]).values_list('machine__line_id', flat=True).first()
+        try:
+            start_date, end_date = request_window(start_date, end_date, line_id, day, shift)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start_date >= end_date:
+            return Response({"error": "StartDate must be before EndDate."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_tags = getattr(settings, 'DAQLOG_QUERY_MAX_TAGS', 200)
+        if len(tag_ids) > max_tags:
+            return Response({"error": f"At most {max_tags} tags per query."}, status=status.HTTP_400_BAD_REQUEST)
+
+        resolution = params.get('Resolution', 'raw')
+        if resolution == 'auto':
+            resolution = pick_resolution(start_date, end_date)
+        elif resolution != 'raw' and resolution not in RESOLUTIONS:
+            return Response(
+                {"error": f"Resolution must be one of raw, auto, {', '.join(RESOLUTIONS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        max_points = params.get('MaxPoints')
+        method = params.get('Method', 'lttb')
+        if max_points is not None:
+            try:
+                max_points = int(max_points)
+                if max_points < 3:
+                    raise ValueError
+            except ValueError:
+                return Response({"error": "MaxPoints must be an integer of at least 3."}, status=status.HTTP_400_BAD_REQUEST)
+            if method not in METHODS:
+                return Response(
+                    {"error": f"Method must be one of {', '.join(METHODS)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        tz = timezone.get_current_timezone()
+        series = {tag_id: [] for tag_id in tag_ids}
+
+        if resolution != 'raw':
+            rollups = query_rollups_for_tags(tag_ids, start_date, end_date, resolution).values_list(
+                'tag_id', 'bucket', 'avg_value', 'min_value', 'max_value'
+            )
+            for tag_id, bucket, avg_value, min_value, max_value in rollups:
+                series[tag_id].append({
+                    "timestamp": format_datetime(bucket, tz), "value": avg_value, "min": min_value, "max": max_value,
+                })
+            return Response([{"tag": tag_id, "points": points} for tag_id, points in series.items()])
+
+        rows = (
+            DaqLog.objects.filter(tag_id__in=tag_ids, timestamp__range=(start_date, end_date))
+            .order_by('tag_id', 'timestamp')
+            .values_list('tag_id', 'timestamp', 'value')
+        )
+        for tag_id, group in groupby(rows, key=itemgetter(0)):
+            series[tag_id] = [(timestamp, value) for _, timestamp, value in group]
+
+        if start_date < retention_cutoff():
+            for tag_id in series:
+                archived = read_archive(tag_id, start_date, end_date, ('timestamp', 'value'))
+                if archived:
+                    series[tag_id] = sorted(archived + series[tag_id], key=itemgetter(0))
+
+        result = []
+        for tag_id, points in series.items():
+            if max_points is not None:
+                points = downsample(points, max_points, method)
+            result.append({
+                "tag": tag_id,
+                "points": [{"timestamp": format_datetime(timestamp, tz), "value": value} for timestamp, value in points],
+            })
+        return Response(result, status=status.HTTP_200_OK)
+
+class LatestValuesView(APIView):
+    def get(self, request):
+        line_id = request.query_params.get('LineId')
+        machine_id = request.query_params.get('MachineId')
+
+        if not (line_id or machine_id):
+            return Response({"error": "LineId or MachineId is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if machine_id:
+                tag_ids = scope_tag_ids(machine_id=int(machine_id))
+            else:
+                tag_ids = scope_tag_ids(line_id=int(line_id))
+        except ValueError:
+            return Response({"error": "LineId and MachineId must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(latest_values(tag_ids), status=status.HTTP_200_OK)
+
+class EventStreamView(View):
+    """Server-Sent Events feed of new readings and alerts.
+
+    LineId, MachineId and TagId each take a comma-separated list of ids; an
+    event is sent if it matches any of them. Serve under ASGI so that open
+    streams do not each hold a worker thread.
+    """
+
+    async def get(self, request):
+        try:
+            scopes = {
+                param: [int(value) for value in request.GET.get(param, '').split(',') if value]
+                for param in ('LineId', 'MachineId', 'TagId')
+            }
+        except ValueError:
+            return JsonResponse({"error": "LineId, MachineId and TagId must be comma-separated integers."}, status=400)
+
+        response = StreamingHttpResponse(
+            event_stream(scopes['LineId'], scopes['MachineId'], scopes['TagId']),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+def error_response(message, status_code=status.HTTP_400_BAD_REQUEST):
+    return JsonResponse({"error": message}, status=status_code)
+
+
+def json_response(data):
+    # DRF's encoder, so timestamps match the DRF views to the microsecond.
+    return JsonResponse(data, encoder=JSONEncoder, safe=False)
+
+
+def parse_window(start_date, end_date):
+    start_date, end_date = parse_datetime(start_date or ''), parse_datetime(end_date or '')
+    if start_date is None or end_date is None:
+        raise ValueError
+    return start_date, end_date
+
+
+def request_window(start_date, end_date, line_id, day=None, shift=None):
+    """(start, end) from explicit dates, else from the day/shift selectors.
+
+    Raises ValueError with the message for the client.
+    """
+    if start_date or end_date or not (day or shift):
+        try:
+            return parse_window(start_date, end_date)
+        except ValueError:
+            raise ValueError("Invalid date format.")
+    return resolve_window(line_id, day, shift)
+
+
+class AsyncDaqLogView(View):
+    """ASGI-native /daqlogs/ GET for JSON and NDJSON output.
+
+    Takes the same parameters as DaqLogView; columnar and CSV output stay on
+    the sync route.
+    """
+
+    async def get(self, request):
+        params = request.GET
+        line_id, machine_id, tag_id = params.get('LineId'), params.get('MachineId'), params.get('TagId')
+
+        start_date, end_date, day, shift = (params.get(key) for key in ('StartDate', 'EndDate', 'Day', 'Shift'))
+
+        if not all([line_id, machine_id, tag_id]) or not (start_date and end_date or day or shift):
+            return error_response("LineId, MachineId, TagId, and StartDate and EndDate or Day/Shift are required.")
+        try:
+            start_date, end_date = await sync_to_async(request_window)(start_date, end_date, line_id, day, shift)
+        except ValueError as error:
+            return error_response(str(error))
+        if start_date >= end_date:
+            return error_response("StartDate must be before EndDate.")
+
+        resolution = params.get('Resolution', 'raw')
+        if resolution != 'raw':
+            if resolution == 'auto':
+                resolution = pick_resolution(start_date, end_date)
+            elif resolution not in RESOLUTIONS:
+                return error_response(f"Resolution must be one of raw, auto, {', '.join(RESOLUTIONS)}.")
+            rollups = query_rollups(tag_id, start_date, end_date, resolution).filter(
+                tag__machine__line_id=line_id,
+                tag__machine_id=machine_id,
+            )
+            return json_response(DaqLogRollupSerializer([rollup async for rollup in rollups], many=True).data)
+
+        max_points = params.get('MaxPoints')
+        method = params.get('Method', 'lttb')
+        if max_points is not None:
+            try:
+                max_points = int(max_points)
+                if max_points < 3:
+                    raise ValueError
+            except ValueError:
+                return error_response("MaxPoints must be an integer of at least 3.")
+            if method not in METHODS:
+                return error_response(f"Method must be one of {', '.join(METHODS)}.")
+
+        fmt = params.get('Format', 'json')
+        if fmt not in ('json', 'ndjson'):
+            return error_response("Format must be one of json, ndjson.")
+
+        queryset = DaqLog.objects.filter(
+            tag__machine__line_id=line_id,
+            tag__machine_id=machine_id,
+            tag_id=tag_id,
+            timestamp__range=(start_date, end_date)
+        )
+        archived = start_date < retention_cutoff() and await SensorTag.objects.filter(
+            id=tag_id, machine_id=machine_id, machine__line_id=line_id
+        ).aexists()
+
+        if max_points is not None:
+            rows = [row async for row in queryset.order_by('timestamp').values_list('timestamp', 'value')]
+            if archived:
+                older = await sync_to_async(read_archive)(tag_id, start_date, end_date, ('timestamp', 'value'))
+                rows = sorted(older + rows, key=itemgetter(0))
+            rows = downsample(rows, max_points, method)
+            return json_response([
+                {"timestamp": timestamp, "value": value, "tag": int(tag_id)}
+                for timestamp, value in rows
+            ])
+
+        columns = DaqLogFastSerializer.columns
+        if fmt == 'ndjson':
+            chunks = archive_chunks(tag_id, start_date, end_date, columns) if archived else None
+            return StreamingHttpResponse(_async_ndjson(queryset, chunks), content_type='application/x-ndjson')
+
+        older = await sync_to_async(read_archive)(tag_id, start_date, end_date, columns) if archived else []
+
+        # Not aiterator(): on values_list() querysets it runs the query in
+        # the event loop thread and raises SynchronousOnlyOperation.
+        rows = [row async for row in queryset.values_list(*columns)]
+        if older:
+            rows = sorted(older + rows, key=itemgetter(1, 0))
+        tz = timezone.get_current_timezone()
+        return json_response([DaqLogFastSerializer.to_dict(row, tz) for row in rows])
+
+
+async def _async_ndjson(queryset, archived):
+    to_dict = DaqLogFastSerializer.to_dict
+    tz = timezone.get_current_timezone()
+    if archived is not None:
+        # Parquet reads block, so each archive chunk is read in a thread.
+        while (rows := await sync_to_async(next)(archived, None)) is not None:
+            yield ''.join(json.dumps(to_dict(row, tz)) + '\n' for row in rows)
+    async for rows in akeyset_chunks(queryset, DaqLogFastSerializer.columns):
+        yield ''.join(json.dumps(to_dict(row, tz)) + '\n' for row in rows)
+
+
+class AsyncProductionMetricsView(View):
+    async def get(self, request):
+        line_id, start_date, end_date, day, shift = (
+            request.GET.get(key) for key in ('line_id', 'start_date', 'end_date', 'day', 'shift')
+        )
+
+        if not line_id or not (start_date and end_date or day or shift):
+            return error_response("line_id, and start_date and end_date or day/shift are required.")
+        try:
+            start_date, end_date = await sync_to_async(request_window)(start_date, end_date, line_id, day, shift)
+            check_retention(start_date)
+        except ValueError as error:
+            return error_response(str(error))
+        if start_date >= end_date:
+            return error_response("start_date must be before end_date.")
+
+        try:
+            metrics = await acached_line_metrics(line_id, start_date, end_date)
+        except Line.DoesNotExist:
+            return error_response("Line not found.", status.HTTP_404_NOT_FOUND)
+        return json_response(metrics)
+
+
+class AsyncAlertView(View):
+    async def get(self, request):
+        line_id = request.GET.get('Line')
+        start_date = request.GET.get('StartDate')
+        end_date = request.GET.get('EndDate')
+
+        if start_date and end_date:
+            try:
+                start_date, end_date = parse_window(start_date, end_date)
+            except ValueError:
+                return error_response("Invalid date format.")
+            alerts = Alert.objects.filter(timestamp__range=[start_date, end_date])
+            if line_id:
+                alerts = alerts.filter(line=line_id)
+        else:
+            alerts = Alert.objects.all().order_by('-timestamp')[:25]
+
+        tz = timezone.get_current_timezone()
+        to_dict = AlertFastSerializer.to_dict
+        return json_response([to_dict(row, tz) async for row in alerts.values_list(*AlertFastSerializer.columns)])
+
 #remove in the future
 class MachinePerformanceView(APIView):
+    renderer_classes = TIMESERIES_RENDERERS
+
     def get(self, request):
         start_date = request.query_params.get('StartDate')
         end_date = request.query_params.get('EndDate')
@@ -101,56 +610,93 @@ class MachinePerformanceView(APIView):
 
         if start_date >= end_date:
             return Response({"error": "StartDate must be before EndDate."}, status=status.HTTP_400_BAD_REQUEST)
-
-        lines = Line.objects.all()
-        performance_data = []
-
-        for line in lines:
-            logs = DaqLog.objects.filter(
-                tag__machine__line=line,
+        try:
+            check_retention(start_date)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One grouped pass over the window instead of two aggregates per line.
+        totals = {
+            row['tag__machine__line_id']: row
+            for row in DaqLog.objects.filter(
+                tag__metric_role__in=[SensorTag.PRODUCTION, SensorTag.DOWNTIME],
                 timestamp__range=(start_date, end_date)
+            ).values('tag__machine__line_id').annotate(
+                total_production=Sum('value', filter=Q(tag__metric_role=SensorTag.PRODUCTION)),
+                total_downtime=Sum('value', filter=Q(tag__metric_role=SensorTag.DOWNTIME)),
             )
+        }
 
-            production_logs = logs.filter(tag__name__icontains='Production')
-            production = production_logs.aggregate(total_production=Sum('value'))['total_production'] or 0
-
-            downtime_logs = logs.filter(tag__name__icontains='Downtime')
-            downtime = downtime_logs.aggregate(total_downtime=Sum('value'))['total_downtime'] or 0
-
+        performance_data = []
+        for line_id, line_name in Line.objects.values_list('id', 'name'):
+            row = totals.get(line_id, {})
             performance_data.append({
-                "line_id": line.id,
-                "line_name": line.name,
-                "production": production,
-                "downtime": downtime
+                "line_id": line_id,
+                "line_name": line_name,
+                "production": row.get('total_production') or 0,
+                "downtime": row.get('total_downtime') or 0
             })
 
         return Response(performance_data, status=status.HTTP_200_OK)
 
-class LineViewSet(viewsets.ModelViewSet):
+class TopologyETagMixin:
+    # Every change to topology rows moves the topology version, so
+    # list/retrieve responses can be revalidated against it alone.
+    def topology_etag(self, request):
+        return topology.make_etag(topology.get_version(), request.get_full_path())
+
+    def list(self, request, *args, **kwargs):
+        return self.with_etag(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.with_etag(request, super().retrieve, *args, **kwargs)
+
+    def with_etag(self, request, handler, *args, **kwargs):
+        etag = self.topology_etag(request)
+        if topology.etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+class LineViewSet(TopologyETagMixin, viewsets.ModelViewSet):
     queryset = Line.objects.all()
     serializer_class = LineSerializer
 
-class SensorTagViewSet(viewsets.ModelViewSet):
+class SensorTagViewSet(TopologyETagMixin, viewsets.ModelViewSet):
     queryset = SensorTag.objects.all()
     serializer_class = SensorTagSerializer
 
-class SensorTagTypeViewSet(viewsets.ModelViewSet):
+class SensorTagTypeViewSet(TopologyETagMixin, viewsets.ModelViewSet):
     queryset = SensorTagType.objects.all()
     serializer_class = SensorTagTypeSerializer
 
 class DaqLogViewSet(viewsets.ModelViewSet):
     queryset = DaqLog.objects.all()
     serializer_class = DaqLogSerializer
+    pagination_class = TimeSeriesCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(DaqLogFastSerializer(page, many=True).data)
+        return Response(DaqLogFastSerializer(queryset, many=True).data)
 
-class PlantViewSet(viewsets.ModelViewSet):
+    def perform_create(self, serializer):
+        log = serializer.save()
+        after_write([log.tag_id], [log.timestamp], [log.value])
+
+class PlantViewSet(TopologyETagMixin, viewsets.ModelViewSet):
     queryset = Plant.objects.all()
     serializer_class = PlantSerializer
 
-class BlockViewSet(viewsets.ModelViewSet):
+class BlockViewSet(TopologyETagMixin, viewsets.ModelViewSet):
     queryset = Block.objects.all()
     serializer_class = BlockSerializer
 
-class MachineViewSet(viewsets.ModelViewSet):
+class MachineViewSet(TopologyETagMixin, viewsets.ModelViewSet):
     queryset = Machine.objects.all()
     serializer_class = MachineSerializer
 
@@ -177,13 +723,13 @@ class AlertView(APIView):
         else:
             alerts = Alert.objects.all().order_by('-timestamp')[:25]
 
-        serializer = AlertSerializer(alerts, many=True)
+        serializer = AlertFastSerializer(alerts, many=True)
         return Response(serializer.data)
 
     def post(self, request):
         serializer = AlertSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            publish_alerts([serializer.save()])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -227,6 +773,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
 class IncidentTransactionViewSet(viewsets.ModelViewSet):
     queryset = IncidentTransaction.objects.all()
     serializer_class = IncidentTransactionSerializer
+    pagination_class = TimeSeriesCursorPagination
 
     def get_queryset(self):
         queryset = IncidentTransaction.objects.all()
@@ -237,141 +784,109 @@ class IncidentTransactionViewSet(viewsets.ModelViewSet):
 
 class ControlPanelDataView(APIView):
     def post(self, request):
-        lines = Line.objects.filter(status='active')
-        sensor_tags = SensorTag.objects.all()
-        
-        logs = []
+        tags = control_panel_tags()
+
+        try:
+            values = control_panel_values(tags, request.data)
+        except (TypeError, ValueError):
+            return Response({"error": "Control panel readings must be numeric."}, status=status.HTTP_400_BAD_REQUEST)
+
         timestamp = timezone.localtime(timezone.now())
-        
-        for line in lines:
-            for machine in Machine.objects.filter(line=line):
-                for tag in sensor_tags.filter(machine=machine):
-                    if tag.name == 'Watts Consumed':
-                        value = request.data.get('Vry', 0)
-                    elif tag.name == 'Voltage Phase R-Y':
-                        value = request.data.get('Vry', 0)
-                    elif tag.name == 'Voltage Phase Y-B':
-                        value = request.data.get('Vyb', 0)
-                    elif tag.name == 'Voltage Phase B-R':
-                        value = request.data.get('Vbr', 0)
-                    elif tag.name == 'Current Phase R':
-                        value = request.data.get('Cr', 0)
-                    elif tag.name == 'Current Phase Y':
-                        value = request.data.get('Cy', 0)
-                    elif tag.name == 'Current Phase B':
-                        value = request.data.get('Cb', 0)
-                    elif tag.name == 'Frequency':
-                        value = request.data.get('Freq', 0)
-                    elif tag.name == 'Temperature':
-                        value = request.data.get('Temp', 0)
-                    else:
-                        value = random.uniform(tag.min_val, tag.max_val)
-
-                    value = max(min(value, tag.max_val), tag.min_val)
-
-                    log = DaqLog(
-                        timestamp=timestamp,
-                        tag=tag,
-                        value=value
-                    )
-                    logs.append(log)
-
-        DaqLog.objects.bulk_create(logs)
+        write_daqlogs(tags['ids'], [timestamp] * len(tags['ids']), values.tolist())
 
         return Response({"message": "Data logged successfully"}, status=status.HTTP_201_CREATED)
 
 class ProductionLineDetailView(APIView):
     def get(self, request):
-        lines = Line.objects.all()
-        result = []
+        version = topology.get_version()
+        etag = topology.make_etag(version)
+        if topology.etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
 
-        for line in lines:
-            line_data = LineSerializer(line).data
-            machines = Machine.objects.filter(line=line)
-            line_data['machines'] = []
-
-            for machine in machines:
-                machine_data = MachineSerializer(machine).data
-                tags = SensorTag.objects.filter(machine=machine)
-                machine_data['tags'] = SensorTagSerializer(tags, many=True).data
-                line_data['machines'].append(machine_data)
-
-            result.append(line_data)
-
-        return Response(result, status=status.HTTP_200_OK)
+        return Response(topology.get_snapshot(version), status=status.HTTP_200_OK, headers={'ETag': etag})
 
 class ProductionMetricsView(APIView):
+    renderer_classes = TIMESERIES_RENDERERS
+
     def get(self, request):
         line_id = request.query_params.get('line_id')
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
+        day = request.query_params.get('day')
+        shift = request.query_params.get('shift')
 
-        if not all([line_id, start_date, end_date]):
+        if not line_id or not (start_date and end_date or day or shift):
             return Response(
-                {"error": "line_id, start_date, and end_date are required."},
+                {"error": "line_id, and start_date and end_date or day/shift are required."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            start_date = parse_datetime(start_date)
-            end_date = parse_datetime(end_date)
-            if start_date is None or end_date is None:
-                raise ValueError
-        except ValueError:
-            return Response({"error": "Invalid date format."}, status=status.HTTP_400_BAD_REQUEST)
+            start_date, end_date = request_window(start_date, end_date, line_id, day, shift)
+            check_retention(start_date)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
 
         if start_date >= end_date:
             return Response({"error": "start_date must be before end_date."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            line = Line.objects.get(id=line_id)
+            metrics = cached_line_metrics(line_id, start_date, end_date)
         except Line.DoesNotExist:
             return Response({"error": "Line not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Calculate metrics
-        production_logs = DaqLog.objects.filter(
-            tag__machine__line_id=line_id,
-            tag__name__icontains='Production',
-            timestamp__range=(start_date, end_date)
-        )
-        
-        downtime_logs = DaqLog.objects.filter(
-            tag__machine__line_id=line_id,
-            tag__name__icontains='Downtime',
-            timestamp__range=(start_date, end_date)
-        )
+        return Response(metrics, status=status.HTTP_200_OK)
 
-        quality_logs = DaqLog.objects.filter(
-            tag__machine__line_id=line_id,
-            tag__name__icontains='Quality',
-            timestamp__range=(start_date, end_date)
-        )
 
-        total_time = (end_date - start_date).total_seconds() / 3600  # in hours
-        
-        production = production_logs.aggregate(total_production=Sum('value'))['total_production'] or 0
-        downtime = downtime_logs.aggregate(total_downtime=Sum('value'))['total_downtime'] or 0
-        
-        production_rate = production / total_time if total_time > 0 else 0
-        availability = (total_time - downtime) / total_time if total_time > 0 else 0
-        
-        # Efficiency calculation
-        target_production = line.target_production * total_time
-        efficiency = production / target_production if target_production > 0 else 0
-
-        # Quality calculation
-        good_products = quality_logs.filter(value__gte=0.95).aggregate(total=Sum('value'))['total'] or 0
-        total_products = quality_logs.aggregate(total=Sum('value'))['total'] or 0
-        quality = good_products / total_products if total_products > 0 else 0
-
-        metrics = {
-            "line_name": line.name,
-            "production": round(production, 1),
-            "production_rate": round(production_rate, 1),
-            "efficiency": round(efficiency, 1) ,
-            "downtime": downtime,
-            "availability": availability,
-            "quality": quality
-        }
+class ProductionMetricsSeriesView(APIView):
+    """Production metrics per hour, shift or day of a window."""
+
+    def get(self, request):
+        line_id = request.query_params.get('line_id')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        day = request.query_params.get('day')
+        shift = request.query_params.get('shift')
+        interval = request.query_params.get('interval', 'hour')
+
+        if not line_id or not (start_date and end_date or day or shift):
+            return Response(
+                {"error": "line_id, and start_date and end_date or day/shift are required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if interval not in INTERVALS:
+            return Response(
+                {"error": f"interval must be one of {', '.join(INTERVALS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            line_id = int(line_id)
+        except ValueError:
+            return Response({"error": "line_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start_date, end_date = request_window(start_date, end_date, line_id, day, shift)
+            check_retention(start_date)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start_date >= end_date:
+            return Response({"error": "start_date must be before end_date."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_buckets = getattr(settings, 'METRICS_SERIES_MAX_BUCKETS', 2000)
+        try:
+            windows = line_windows(line_id, aware(start_date), aware(end_date), interval)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if len(windows) > max_buckets:
+            return Response(
+                {"error": f"The window spans more than {max_buckets} buckets; use a longer interval."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            series = cached_line_metrics_series(line_id, start_date, end_date, interval)
+        except Line.DoesNotExist:
+            return Response({"error": "Line not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response(metrics, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(series, status=status.HTTP_200_OK)
\ No newline at end of file